@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:19:04 2026
+
+@author: Dirk
+
+
+EOF truncation diagnostics for the number of PCs used in the KMeans clustering
+of EOF.py: North's rule of thumb errors and year-block bootstrap stability of
+the leading EOFs. Saves the table and a plot of the variance fractions with
+their North errors.
+"""
+
+from pathlib import Path
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+from eof_solver import TruncatedEof, eof_stability_report
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+f_out = data_folder / 'eof_diagnostics_30days_lowpass_2_0-1.csv'
+fig_out = data_folder / 'fig/eof_diagnostics_30days_lowpass_2_0-1.png'
+
+#modes to judge, EOF subspace for the bootstrap and number of resamples
+nmodes = 20
+neofs = 40
+nboot = 1000
+#minimum 5th percentile congruence of a stable pattern
+min_congruence = 0.9
+
+
+
+######################EOF analysis and diagnostics######################
+if __name__ == '__main__':
+    z_all_ano_std = xr.open_dataset(filename)['z']
+
+    coslat = np.cos(np.deg2rad(z_all_ano_std.coords['latitude'].values)).clip(0., 1.)
+    wgts = np.sqrt(coslat)[..., np.newaxis]
+    solver = TruncatedEof(z_all_ano_std, weights=wgts, neofs=neofs)
+
+    report = eof_stability_report(solver, z_all_ano_std.time.dt.year.values, nmodes=nmodes, nboot=nboot)
+    report['stable'] = report.separated & (report.congruence_p05 > min_congruence)
+    report.to_csv(f_out)
+
+    # Leading modes that are separated and stable
+    truncation = int(np.argmin(report.stable.values)) if not report.stable.all() else nmodes
+    print(report.round(3))
+    print('Leading separated and stable modes:', truncation)
+
+
+    ######################Plot results#################
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.errorbar(report.index, report.variance_fraction * 100,
+                yerr=report.north_error / report.eigenvalue * report.variance_fraction * 100,
+                fmt='o', color='black', capsize=3)
+    ax.plot(report.index[~report.stable], report.variance_fraction[~report.stable] * 100, 'o', color='red')
+    ax.axvline(truncation - 0.5, ls='--', color='grey')
+    ax.set_xlabel('EOF mode')
+    ax.set_ylabel('Explained variance (%)')
+    ax.set_xticks(report.index)
+    fig.savefig(fig_out)
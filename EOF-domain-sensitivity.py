@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:20:24 2026
+
+@author: Dirk
+
+
+Sensitivity of the weather regimes to the Euro-Atlantic domain.
+
+The anomaly cube is loaded once into shared memory. Every sub-domain (lat/lon
+box) is evaluated in a worker process on its slice of the shared cube:
+truncated EOFs, KMeans and the regime composites. The regimes of every domain
+are matched one-to-one with the baseline regimes (composites of the baseline
+labels on the same box) and the pattern correlation, frequency and day-by-day
+agreement are tabulated.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+import xarray as xr
+
+from eof_solver import TruncatedEof
+from shared_cube import attach_array, shared_array
+from wr_cluster import align_regimes, composites
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+f_out = data_folder / 'domain_sensitivity_30days_lowpass_2_0-1.csv'
+
+#Sub-domains (lat_min, lat_max, lon_min, lon_max), 'baseline' is the whole file
+domains = {
+    'baseline': None,
+    'north_shift': (40, 90, -80, 40),
+    'south_shift': (20, 70, -80, 40),
+    'west_shift': (20, 90, -90, 20),
+    'east_shift': (20, 90, -60, 50),
+    'small_box': (35, 75, -60, 30),
+    'europe': (35, 75, -20, 40),
+}
+neofs = 14
+n_clusters = 7
+
+
+
+######################Functions######################
+def box_slices(latitude, longitude, box):
+    # Index slices of a lat/lon box, basic slicing keeps views of the cube
+    if box is None:
+        return slice(None), slice(None)
+    lat = np.where((latitude >= box[0]) & (latitude <= box[1]))[0]
+    lon = np.where((longitude >= box[2]) & (longitude <= box[3]))[0]
+    return slice(lat[0], lat[-1] + 1), slice(lon[0], lon[-1] + 1)
+
+
+def domain_regimes(spec, coords, box, baseline_labels):
+    with attach_array(spec) as cube:
+        lat, lon = box_slices(coords['latitude'], coords['longitude'], box)
+        z = xr.DataArray(cube[:, lat, lon], dims=('time', 'latitude', 'longitude'),
+                         coords={'time': coords['time'],
+                                 'latitude': coords['latitude'][lat],
+                                 'longitude': coords['longitude'][lon]})
+
+        coslat = np.cos(np.deg2rad(z.coords['latitude'].values)).clip(0., 1.)
+        wgts = np.sqrt(coslat)[..., np.newaxis]
+        solver = TruncatedEof(z, weights=wgts, neofs=neofs)
+        labels = KMeans(n_clusters=n_clusters, n_init=10, random_state=0).fit(solver.pcs().values).labels_
+
+        comp = composites(z.values, labels, n_clusters)
+        if baseline_labels is None:
+            comp_base = comp
+        else:
+            comp_base = composites(z.values, baseline_labels, n_clusters)
+        del z
+    return labels, comp, comp_base
+
+
+def compare_to_baseline(name, labels, comp, comp_base, baseline_labels):
+    # Optimal one-to-one matching of the domain regimes to the baseline regimes
+    mapping, corr = align_regimes(comp_base, comp)
+    match = np.argsort(mapping)
+    base = np.arange(n_clusters)
+    return pd.DataFrame({'domain': name,
+                         'wr': base,
+                         'matched_wr': match,
+                         'corr': corr[base, match],
+                         'frequency': np.bincount(labels, minlength=n_clusters)[match] / len(labels),
+                         'frequency_baseline': np.bincount(baseline_labels, minlength=n_clusters)[base] / len(labels),
+                         'agreement': [np.mean(labels[baseline_labels == i] == j) for i, j in zip(base, match)]})
+
+
+
+######################Run all domains######################
+if __name__ == '__main__':
+    z_all_ano_std = xr.open_dataset(filename)['z'].transpose('time', 'latitude', 'longitude')
+    coords = {'time': z_all_ano_std.time.values,
+              'latitude': z_all_ano_std.latitude.values,
+              'longitude': z_all_ano_std.longitude.values}
+
+    with shared_array(z_all_ano_std.values) as spec, ProcessPoolExecutor() as pool:
+        baseline_labels, comp, _ = domain_regimes(spec, coords, domains['baseline'], None)
+        runs = {name: pool.submit(domain_regimes, spec, coords, box, baseline_labels)
+                for name, box in domains.items() if name != 'baseline'}
+        table = [compare_to_baseline('baseline', baseline_labels, comp, comp, baseline_labels)]
+        for name, run in runs.items():
+            table.append(compare_to_baseline(name, *run.result(), baseline_labels))
+
+    table = pd.concat(table, ignore_index=True)
+    table.to_csv(f_out, index=False)
+    print(table.pivot(index='wr', columns='domain', values='corr').round(2))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:02:11 2026
+
+@author: Dirk
+
+
+Season specific weather regimes: EOF analysis and KMeans clustering of the
+standardized 500 hPa anomalies for DJF, MAM, JJA and SON, run concurrently in
+worker processes. The anomaly cube is loaded once into shared memory and every
+worker reads its season from there.
+
+Writes one regime model and one wr_time label series per season.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from sklearn.cluster import KMeans
+import xarray as xr
+
+from eof_solver import TruncatedEof
+from regime_model import RegimeModel
+from shared_cube import attach_array, shared_array
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+f_out = 'wr_time-c7_std_30days_lowpass_2_0-1_{}.nc'
+m_out = 'wr_model-c7_std_30days_lowpass_2_0-1_{}.nc'
+
+seasons = ['DJF', 'MAM', 'JJA', 'SON']
+neofs = 14
+n_clusters = 7
+
+
+
+######################Functions######################
+def season_regimes(spec, index, coords, season):
+    # The days of a season are not contiguous in the shared cube, so they are
+    # gathered once into a private buffer. The solver weights and centers that
+    # buffer in place (copy=False), it is the only copy in the worker.
+    with attach_array(spec) as cube:
+        z = xr.DataArray(np.take(cube, index, axis=0), dims=('time', 'latitude', 'longitude'),
+                         coords={'time': coords['time'][index],
+                                 'latitude': coords['latitude'],
+                                 'longitude': coords['longitude']})
+
+    coslat = np.cos(np.deg2rad(z.coords['latitude'].values)).clip(0., 1.)
+    wgts = np.sqrt(coslat)[..., np.newaxis]
+    solver = TruncatedEof(z, weights=wgts, neofs=neofs, copy=False)
+
+    model = KMeans(n_clusters=n_clusters, n_init=10, random_state=0)
+    model.fit(solver.pcs().values)
+
+    regime_model = RegimeModel.from_solver(solver, model, z, wgts,
+                                           source=filename.name, season=season)
+    wr_time = xr.DataArray(model.labels_, dims=("time"), coords={"time": z.time}, name='wr')
+    return season, regime_model.to_dataset(), wr_time
+
+
+
+######################EOF and clustering per season######################
+if __name__ == '__main__':
+    z_all_ano_std = xr.open_dataset(filename)['z'].transpose('time', 'latitude', 'longitude')
+    coords = {'time': z_all_ano_std.time.values,
+              'latitude': z_all_ano_std.latitude.values,
+              'longitude': z_all_ano_std.longitude.values}
+    season_of_day = z_all_ano_std.time.dt.season.values
+
+    with shared_array(z_all_ano_std.values) as spec, ProcessPoolExecutor(max_workers=len(seasons)) as pool:
+        runs = [pool.submit(season_regimes, spec, np.where(season_of_day == season)[0], coords, season)
+                for season in seasons]
+        for run in runs:
+            season, regime_model, wr_time = run.result()
+            regime_model.to_netcdf(data_folder / m_out.format(season))
+            wr_time.to_netcdf(data_folder / f_out.format(season))
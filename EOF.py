@@ -17,8 +17,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 # from datetime import datetime
 from eofs.xarray import Eof
+from eof_solver import IncrementalEof, RotatedEof, TruncatedEof, compare_solvers
 from pathlib import Path
 import pandas as pd
+from regime_model import RegimeModel
+from wr_cluster import GaussianHMM, consensus_kmeans, minibatch_kmeans, persistent_kmeans
+from wr_stats import episodes, save_episodes
 # import seaborn as sns
 from sklearn.cluster import KMeans
 import xarray as xr 
@@ -30,10 +34,34 @@ import matplotlib as mpl
 data_folder = Path("../data/")
 filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
 f_out = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1.nc'
+m_out = data_folder / 'wr_model-c7_std_30days_lowpass_2_0-1.nc'
+c_out = data_folder / 'wr_confidence-c7_std_30days_lowpass_2_0-1.nc'
+p_out = data_folder / 'wr_membership-c7_std_30days_lowpass_2_0-1.nc'
+h_out = data_folder / 'wr_hmm-c7_std_30days_lowpass_2_0-1.nc'
+e_out = data_folder / 'wr_episodes-c7_std_30days_lowpass_2_0-1.nc'
 fig_out = data_folder / "fig/EOF7_30days_lowpass_2_0-1.png"
 fig_out2 = data_folder / "fig/clusters-3PCs_30days_lowpass_2_0-1.png"
 z_all_ano_std = xr.open_dataset(filename)['z']
 
+#EOF backend: 'full' (eofs, complete SVD), 'truncated' (leading neofs modes only)
+#or 'incremental' (streams the file in chunks of chunk_size days, for long records)
+eof_backend = 'truncated'
+neofs = 14
+chunk_size = 365
+#varimax rotate the leading neofs EOFs before plotting and clustering
+rotate_eofs = False
+#clustering: 'kmeans' (single fit), 'consensus' (consensus_runs seeded fits),
+#'minibatch' (streamed MiniBatchKMeans for ensembles and long records)
+#'persistent' (no episodes shorter than min_duration days, replaces remove_short_wr.py)
+#or 'hmm' (hidden Markov model, Viterbi labels, posteriors and transition matrix)
+cluster_mode = 'consensus'
+consensus_runs = 50
+min_duration = 4
+switch_penalty = 0.
+#serial cluster number tests (see wr-k-selection.py)
+k_sweep = False
+#compare truncated solution with the full SVD (slow, only for checking)
+check_accuracy = False
 
 
 
@@ -145,19 +173,42 @@ def plot(solver):
 # latitude weights are applied before the computation of EOFs.
 coslat = np.cos(np.deg2rad(z_all_ano_std.coords['latitude'].values)).clip(0., 1.)
 wgts = np.sqrt(coslat)[..., np.newaxis]
-solver = Eof(z_all_ano_std, weights=wgts)
+if eof_backend == 'truncated':
+    solver = TruncatedEof(z_all_ano_std, weights=wgts, neofs=neofs)
+    if check_accuracy:
+        print(compare_solvers(solver, Eof(z_all_ano_std, weights=wgts)))
+elif eof_backend == 'incremental':
+    solver = IncrementalEof(z_all_ano_std, weights=wgts, neofs=neofs, chunk_size=chunk_size)
+else:
+    solver = Eof(z_all_ano_std, weights=wgts)
+if rotate_eofs:
+    solver = RotatedEof(solver, neofs=neofs)
 
 plot(solver)
 
 
 
 ######################K_MEANS CLUSTERING#################
-elbow(solver.pcs()[:,:14])
-silhouette(solver.pcs()[:,:14])
-
-model = KMeans(n_clusters=7)
-# Fit model to samples
-model.fit(solver.pcs()[:,:14])
+#serial elbow and silhouette test, wr-k-selection.py runs all k in parallel
+if k_sweep:
+    elbow(solver.pcs()[:,:14])
+    silhouette(solver.pcs()[:,:14])
+
+if cluster_mode == 'consensus':
+    # Most representative of many seeded fits, regimes ordered by frequency
+    model, confidence, stability = consensus_kmeans(solver.pcs()[:,:14], n_clusters=7, n_runs=consensus_runs)
+elif cluster_mode == 'minibatch':
+    model, labels = minibatch_kmeans(solver.pcs()[:,:14].values, n_clusters=7)
+    model.labels_ = labels
+elif cluster_mode == 'persistent':
+    model, _ = persistent_kmeans(solver.pcs()[:,:14].values, n_clusters=7,
+                                 min_duration=min_duration, switch_penalty=switch_penalty)
+elif cluster_mode == 'hmm':
+    model = GaussianHMM(n_clusters=7).fit(solver.pcs()[:,:14].values)
+else:
+    model = KMeans(n_clusters=7)
+    # Fit model to samples
+    model.fit(solver.pcs()[:,:14])
 
 #Plot clusters on the first two PCA
 # sns.scatterplot(solver.pcs()[:,0], solver.pcs()[:,1], alpha=.1, hue = model.labels_, palette="Paired")
@@ -181,3 +232,23 @@ fig.savefig(fig_out2)
 #### Create Dataset weathter regime / time
 wr_time = xr.DataArray(model.labels_, dims=("time"), coords={"time": z_all_ano_std.time}, name='wr')
 wr_time.to_netcdf(f_out)
+#Episode table (regime, start, end, length, preceding/following regime), see wr_stats.load_episodes
+save_episodes(episodes(wr_time), e_out)
+if cluster_mode == 'consensus':
+    xr.Dataset({'confidence': (('time'), confidence), 'stability': (('wr'), stability)},
+               coords={'time': z_all_ano_std.time, 'wr': np.arange(7)}).to_netcdf(c_out)
+if cluster_mode == 'hmm':
+    xr.Dataset({'posterior': (('time', 'wr'), model.posteriors_),
+                'transmat': (('wr_from', 'wr_to'), model.transmat_)},
+               coords={'time': z_all_ano_std.time, 'wr': np.arange(7),
+                       'wr_from': np.arange(7), 'wr_to': np.arange(7)}).to_netcdf(h_out)
+
+
+#### Save regime model (EOFs, weights, centroids) to classify new fields with RegimeModel.load(m_out).predict(z)
+regime_model = RegimeModel.from_solver(solver, model, z_all_ano_std, wgts,
+                                       source=filename.name, eof_backend=eof_backend,
+                                       rotated=int(rotate_eofs))
+regime_model.save(m_out)
+
+#### Soft regime membership probabilities (time x wr) next to the hard labels
+regime_model.membership(z_all_ano_std, chunk_size=chunk_size).to_netcdf(p_out)
@@ -7,6 +7,7 @@ Created on Thu Dec  3 16:27:19 2020
 
 import numpy as np
 from pathlib import Path
+from wr_stats import load_frequencies, season_frequency, transition_counts, transition_matrix
 # import cartopy.crs as ccrs
 import matplotlib.pyplot as plt
 import xarray as xr
@@ -274,34 +275,14 @@ df_var = df_var.rename({'WR7':'no regime'})
 
 
 #calculate frequencies per wr
-frequency = (wr.where(wr.wr == 0).groupby('time.season').count() / wr.groupby('time.season').count()).to_dataframe().rename(columns={'wr':'WR0'})
-for i in range(1,wr.wr.max().values+1):
-    col = str('WR')+str(i)
-    frequency[col] = (wr.where(wr.wr == i).groupby('time.season').count() / wr.groupby('time.season').count()).wr
-
-tot_frequency = (wr.where(wr.wr == 0).count() / wr.count()).expand_dims(dim='tot').to_dataframe().rename(columns={'wr':'WR0'})
-for i in range(1,wr.wr.max().values+1):
-    col = str('WR')+str(i)
-    tot_frequency[col] = (wr.where(wr.wr == i).count() / wr.count()).expand_dims(dim='tot').wr
-
-frequency = frequency.append(tot_frequency).rename({0: 'tot'})
+frequency = season_frequency(load_frequencies(file_wr))
 frequency = frequency.rename(columns={'WR7':'no regime'})
 
 
 #calculate transition from one wr to next wr
-df_transition_fre = []
-for i in ('DJF', 'MAM', 'JJA', 'SON'):
-    # print(i)
-    df_transition = pd.DataFrame(np.zeros((8,8)),
-                   columns=[0,1,2,3,4,5,6,7])
-    wr_list = wr.wr[wr.groupby('time.season').groups[i]].values.tolist() 
-    for i, j in enumerate(wr_list[:-1]):
-        if j  != wr_list[i+1]: 
-            # print(wr_list[i])
-            # print(wr_list[i+1])
-            df_transition[wr_list[i]][wr_list[i+1]] = df_transition[wr_list[i]][wr_list[i+1]] + 1
-          
-    df_transition_fre.append(df_transition / df_transition.to_numpy().flatten().sum())
+#(rows: to, columns: from) per season DJF, MAM, JJA, SON
+transitions = transition_matrix(transition_counts(wr.wr, n_regimes=8))
+df_transition_fre = [pd.DataFrame(m.T) for m in transitions.values]
 
 #calcualte frequency times #days of wr per season --> for toal variability
 temp_fre_DJF = np.transpose(np.array([frequency.loc['DJF']]*3))
@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+
+@author: Dirk
+
+
+EOF solvers for the gph anomaly cube that only compute the leading modes.
+
+The solvers mimic the parts of eofs.xarray.Eof used in EOF.py
+(eofs, pcs, eigenvalues, varianceFraction, projectField) so they can be
+swapped in for Eof(z_all_ano_std, weights=wgts) without touching the
+plotting or clustering code.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy.linalg import eigh
+from scipy.sparse.linalg import svds
+from sklearn.decomposition import IncrementalPCA
+from sklearn.utils.extmath import randomized_svd, svd_flip
+
+
+
+######################Base solver######################
+class _EofSolver:
+    """Common xarray wrapping of a (time, space) EOF solution."""
+
+    def _set_template(self, array, weights):
+        # Remember the grid of one time step to rebuild maps from flat EOFs
+        self._time = array[array.dims[0]]
+        self._template = array.isel({array.dims[0]: 0}, drop=True)
+        self._space_shape = self._template.shape
+        # Weights in the dtype of the data so a float32 cube stays float32
+        self._dtype = array.dtype if np.issubdtype(array.dtype, np.floating) else np.dtype(np.float64)
+        self._weights = None if weights is None else \
+            np.broadcast_to(weights, self._space_shape).reshape(-1).astype(self._dtype)
+
+    def _flatten(self, values, copy=True):
+        # One (time, space) copy of a (time, ...) block, weighted in place.
+        # With copy=False a writable block of the right dtype is used directly.
+        flat = values.reshape(values.shape[0], -1)
+        if copy or flat.dtype != self._dtype or not flat.flags.writeable or not np.shares_memory(flat, values):
+            flat = np.array(flat, dtype=self._dtype)
+        if self._weights is not None:
+            np.multiply(flat, self._weights, out=flat)
+        return flat
+
+    def _set_solution(self, eofs, pcs, singular_values, total_variance):
+        normfactor = float(len(self._time) - 1)
+        self._E = eofs
+        self._P = pcs
+        self._L = singular_values**2 / normfactor
+        self._total_variance = total_variance / normfactor
+        self.neofs = len(self._L)
+
+    def _modes(self, n):
+        n = self.neofs if n is None else min(n, self.neofs)
+        return n, xr.DataArray(np.arange(n), dims='mode', name='mode')
+
+    def _maps(self, patterns, mode, name):
+        # (mode, valid space) -> (mode, lat, lon) with NaN at missing points
+        flat = np.full((len(patterns), self._valid.size), np.nan, dtype=patterns.dtype)
+        flat[:, self._valid] = patterns
+        return xr.DataArray(flat.reshape((len(patterns),) + self._space_shape),
+                            dims=('mode',) + self._template.dims,
+                            coords=dict(mode=mode, **self._template.coords),
+                            name=name)
+
+    def eofs(self, neofs=None):
+        n, mode = self._modes(neofs)
+        return self._maps(self._E[:n], mode, 'eofs')
+
+    def projectionPatterns(self, neofs=None):
+        # Patterns whose dot product with the weighted anomalies gives the PCs
+        return self.eofs(neofs=neofs)
+
+    def pcs(self, npcs=None, pcscaling=0):
+        n, mode = self._modes(npcs)
+        pcs = self._P[:, :n]
+        if pcscaling == 1:
+            pcs = pcs / np.sqrt(self._L[:n])
+        elif pcscaling == 2:
+            pcs = pcs * np.sqrt(self._L[:n])
+        return xr.DataArray(pcs, dims=(self._time.dims[0], 'mode'),
+                            coords={self._time.dims[0]: self._time, 'mode': mode},
+                            name='pcs')
+
+    def eigenvalues(self, neigs=None):
+        n, mode = self._modes(neigs)
+        return xr.DataArray(self._L[:n], dims='mode', coords={'mode': mode}, name='eigenvalues')
+
+    def varianceFraction(self, neigs=None):
+        n, mode = self._modes(neigs)
+        return xr.DataArray(self._L[:n] / self._total_variance, dims='mode',
+                            coords={'mode': mode}, name='variance_fractions')
+
+    def projectField(self, array, neofs=None):
+        # Pseudo-PCs of new anomalies, centered with the training mean
+        n, mode = self._modes(neofs)
+        flat = self._flatten(np.asarray(array.values))
+        if not self._valid.all():
+            flat = flat[:, self._valid]
+        flat -= self._mean
+        return xr.DataArray(flat @ self._E[:n].T, dims=(array.dims[0], 'mode'),
+                            coords={array.dims[0]: array[array.dims[0]], 'mode': mode},
+                            name='pseudo_pcs')
+
+
+
+######################Truncated SVD solver######################
+class TruncatedEof(_EofSolver):
+    """
+    EOF analysis of the leading neofs modes only.
+
+    method='randomized' uses a randomized range finder (Halko et al. 2011),
+    method='lanczos' uses ARPACK through scipy.sparse.linalg.svds. Both avoid
+    the full (time x space) SVD that eofs.xarray.Eof computes.
+
+    With copy=False the values of array are weighted and centered in place
+    (no copy of the cube if it is a writable float array), array must not be
+    used afterwards.
+    """
+
+    def __init__(self, array, weights=None, neofs=14, method='randomized',
+                 n_oversamples=20, n_iter=5, random_state=0, copy=True):
+        self._set_template(array, weights)
+        data = self._flatten(np.asarray(array.values), copy=copy)
+        self._mean = data.mean(axis=0, dtype=np.float64)
+        self._valid = ~np.isnan(self._mean)
+        # Gathering the valid points copies the cube, only needed with missing values
+        if not self._valid.all():
+            data = data[:, self._valid]
+        self._mean = self._mean[self._valid].astype(self._dtype)
+        data -= self._mean
+        # Variance fractions need the total variance, not all eigenvalues
+        total_variance = float(np.einsum('ij,ij->', data, data, dtype=np.float64))
+
+        if method == 'randomized':
+            u, s, vt = randomized_svd(data, neofs, n_oversamples=n_oversamples,
+                                      n_iter=n_iter, random_state=random_state)
+        elif method == 'lanczos':
+            u, s, vt = svds(data, k=neofs, random_state=random_state)
+            order = np.argsort(s)[::-1]
+            u, s, vt = u[:, order], s[order], vt[order]
+        else:
+            raise ValueError("method must be 'randomized' or 'lanczos'")
+        # Same sign convention as IncrementalEof: largest loading is positive
+        u, vt = svd_flip(u, vt, u_based_decision=False)
+        self.method = method
+        self._set_solution(vt, u * s, s, total_variance)
+
+
+
+######################Out-of-core solver######################
+class IncrementalEof(_EofSolver):
+    """
+    EOF analysis streaming the anomaly cube in time chunks of chunk_size.
+
+    array can be a lazily opened DataArray (xr.open_dataset without .load());
+    only one or two chunks are in memory at a time. method='auto' accumulates
+    the space x space covariance if there are fewer grid points than time
+    steps and the time x time Gram matrix otherwise. method='ipca' uses
+    sklearn's IncrementalPCA instead.
+    """
+
+    def __init__(self, array, weights=None, neofs=14, chunk_size=365, method='auto'):
+        self._set_template(array, weights)
+        self._array = array
+        self._chunk_size = chunk_size
+        n_time = len(self._time)
+
+        #First pass: missing value mask, mean and total variance
+        self._valid = None
+        total = 0
+        sum_sq = 0.
+        for block in self._blocks(center=False):
+            total = total + block.sum(axis=0, dtype=np.float64)
+            sum_sq += np.einsum('ij,ij->', block, block, dtype=np.float64)
+        self._mean = (total / n_time).astype(block.dtype)
+        total_variance = sum_sq - n_time * float(np.dot(total / n_time, total / n_time))
+
+        n_space = self._valid.sum()
+        if method == 'auto':
+            method = 'covariance' if n_space <= n_time else 'gram'
+        self.method = method
+        if method == 'covariance':
+            eofs, pcs, s = self._solve_covariance(neofs)
+        elif method == 'gram':
+            eofs, pcs, s = self._solve_gram(neofs)
+        elif method == 'ipca':
+            eofs, pcs, s = self._solve_ipca(neofs)
+        else:
+            raise ValueError("method must be 'auto', 'covariance', 'gram' or 'ipca'")
+
+        # Fix the arbitrary sign: largest loading of each EOF is positive
+        sign = np.sign(eofs[np.arange(len(s)), np.abs(eofs).argmax(axis=1)])
+        self._set_solution(eofs * sign[:, None], pcs * sign, s, total_variance)
+
+    def _blocks(self, center=True, start=0):
+        time_dim = self._array.dims[0]
+        for i in range(start, len(self._time), self._chunk_size):
+            block = self._flatten(np.asarray(self._array.isel({time_dim: slice(i, i + self._chunk_size)}).values))
+            if self._valid is None:
+                self._valid = ~np.isnan(block).any(axis=0)
+            block = block[:, self._valid]
+            yield block - self._mean if center else block
+
+    def _project(self, eofs):
+        return np.concatenate([block @ eofs.T for block in self._blocks()])
+
+    def _solve_covariance(self, neofs):
+        n_space = self._valid.sum()
+        cov = np.zeros((n_space, n_space))
+        for block in self._blocks():
+            cov += block.T @ block
+        lam, vec = eigh(cov, subset_by_index=[n_space - neofs, n_space - 1])
+        eofs = vec[:, ::-1].T.astype(self._mean.dtype)
+        return eofs, self._project(eofs), np.sqrt(lam[::-1].clip(0))
+
+    def _solve_gram(self, neofs):
+        n_time = len(self._time)
+        gram = np.zeros((n_time, n_time))
+        for i, block_i in enumerate(self._blocks()):
+            a = i * self._chunk_size
+            for j, block_j in enumerate(self._blocks(start=a)):
+                b = a + j * self._chunk_size
+                gram[a:a + len(block_i), b:b + len(block_j)] = block_i @ block_j.T
+                gram[b:b + len(block_j), a:a + len(block_i)] = gram[a:a + len(block_i), b:b + len(block_j)].T
+        lam, u = eigh(gram, subset_by_index=[n_time - neofs, n_time - 1])
+        u, s = u[:, ::-1], np.sqrt(lam[::-1].clip(0))
+        # EOFs follow from X^T u / s, accumulated chunk by chunk
+        eofs = 0
+        for i, block in enumerate(self._blocks()):
+            eofs = eofs + u[i * self._chunk_size:i * self._chunk_size + len(block)].T @ block
+        return (eofs / s[:, None]).astype(self._mean.dtype), u * s, s
+
+    def _solve_ipca(self, neofs):
+        ipca = IncrementalPCA(n_components=neofs)
+        for block in self._blocks():
+            ipca.partial_fit(block)
+        eofs = ipca.components_.astype(self._mean.dtype)
+        return eofs, self._project(eofs), ipca.singular_values_
+
+
+
+######################Varimax rotation######################
+def varimax(loadings, gamma=1.0, normalize=True, max_iter=500, tol=1e-8):
+    """
+    Varimax rotation of a (space, mode) loading matrix.
+
+    Iterates with (mode x mode) SVDs only. With normalize=True the rows are
+    Kaiser normalized by their communality before the rotation.
+    Returns the rotated loadings and the orthogonal rotation matrix.
+    """
+    p, k = loadings.shape
+    h = np.sqrt((loadings**2).sum(axis=1, keepdims=True)) if normalize else np.ones((p, 1))
+    h[h == 0] = 1.
+    a = loadings / h
+    rotation = np.eye(k)
+    d = 0.
+    for _ in range(max_iter):
+        b = a @ rotation
+        u, sv, vt = np.linalg.svd(a.T @ (b**3 - (gamma / p) * b * (b**2).sum(axis=0)))
+        rotation = u @ vt
+        d_old, d = d, sv.sum()
+        if d_old != 0 and d / d_old < 1 + tol:
+            break
+    return loadings @ rotation, rotation
+
+
+class RotatedEof(_EofSolver):
+    """
+    Varimax rotated leading neofs EOFs of an existing solver (TruncatedEof,
+    IncrementalEof or eofs.xarray.Eof).
+
+    The EOFs scaled by the square root of their eigenvalues are rotated, the
+    rotated modes are sorted by the variance they explain. eofs() gives the
+    normalized rotated patterns, pcs() the rotated PCs (X is still approximated
+    by pcs x eofs) and varianceFraction() the variance explained per rotated
+    mode. Only the small (mode x mode) rotation is computed, no new
+    decomposition.
+    """
+
+    def __init__(self, solver, neofs=14, gamma=1.0, normalize=True, max_iter=500, tol=1e-8):
+        self._solver = solver
+        base_eofs = solver.eofs(neofs=neofs)
+        pcs = solver.pcs(npcs=neofs)
+        L = solver.eigenvalues(neigs=neofs).values
+        self._time = pcs[pcs.dims[0]]
+        self._template = base_eofs.isel(mode=0, drop=True)
+        self._space_shape = self._template.shape
+        self._valid = ~np.isnan(base_eofs.isel(mode=0).values.reshape(-1))
+        if hasattr(solver, '_mean'):
+            self._mean = solver._mean
+        E = base_eofs.values.reshape(len(L), -1)[:, self._valid]
+
+        loadings, rotation = varimax(E.T * np.sqrt(L), gamma, normalize, max_iter, tol)
+        norms = np.sqrt((loadings**2).sum(axis=0))
+        order = np.argsort(norms)[::-1]
+        rotation, norms = rotation[:, order], norms[order]
+        # Unit variance PCs rotated and rescaled: pcs_rot = pcs @ T
+        self._T = rotation * norms / np.sqrt(L)[:, None]
+        self.rotation = rotation
+
+        normfactor = float(len(self._time) - 1)
+        total_variance = L[0] / solver.varianceFraction(neigs=1).values[0] * normfactor
+        self._set_solution((loadings[:, order] / norms).T.astype(E.dtype),
+                           pcs.values @ self._T, norms * np.sqrt(normfactor), total_variance)
+        self._projection = (self._T.T @ E).astype(E.dtype)
+
+    def projectionPatterns(self, neofs=None):
+        n, mode = self._modes(neofs)
+        return self._maps(self._projection[:n], mode, 'projection_patterns')
+
+    def projectField(self, array, neofs=None):
+        n, mode = self._modes(neofs)
+        pcs = self._solver.projectField(array, neofs=self.neofs)
+        return xr.DataArray(pcs.values @ self._T[:, :n], dims=pcs.dims,
+                            coords={pcs.dims[0]: pcs[pcs.dims[0]], 'mode': mode},
+                            name='pseudo_pcs')
+
+
+
+######################Accuracy against full solution######################
+def compare_solvers(solver, reference, neofs=None):
+    """
+    Mode by mode agreement of two solvers (e.g. TruncatedEof vs. eofs Eof).
+
+    Returns a DataFrame with both variance fractions, their relative error and
+    the absolute spatial/temporal correlation of EOFs and PCs (sign is
+    arbitrary in an SVD).
+    """
+    n = min(solver.neofs, reference.neofs) if neofs is None else neofs
+    e1 = solver.eofs(neofs=n).values.reshape(n, -1)
+    e2 = reference.eofs(neofs=n).values.reshape(n, -1)
+    valid = ~np.isnan(e1[0]) & ~np.isnan(e2[0])
+    p1 = solver.pcs(npcs=n).values
+    p2 = reference.pcs(npcs=n).values
+    vf1 = solver.varianceFraction(neigs=n).values
+    vf2 = reference.varianceFraction(neigs=n).values
+
+    def corr(a, b):
+        a = a - a.mean(axis=-1, keepdims=True)
+        b = b - b.mean(axis=-1, keepdims=True)
+        return np.abs((a * b).sum(axis=-1)) / np.sqrt((a * a).sum(axis=-1) * (b * b).sum(axis=-1))
+
+    return pd.DataFrame({'variance_fraction': vf1,
+                         'variance_fraction_ref': vf2,
+                         'relative_error': np.abs(vf1 - vf2) / vf2,
+                         'eof_corr': corr(e1[:, valid], e2[:, valid]),
+                         'pc_corr': corr(p1.T, p2.T)},
+                        index=pd.Index(np.arange(n), name='mode'))
+
+
+
+######################Truncation diagnostics######################
+def north_test(solver, neigs=None, n_eff=None):
+    """
+    North et al. (1982) rule of thumb: eigenvalue error L * sqrt(2/N*).
+
+    N* is the effective sample size, estimated from the mean lag-1
+    autocorrelation r of the PCs as N (1 - r^2) / (1 + r^2) if not given.
+    A mode is separated if its distance to both neighbours exceeds its error.
+    """
+    L = solver.eigenvalues(neigs=neigs).values
+    if n_eff is None:
+        pcs = solver.pcs(npcs=len(L)).values
+        pcs = pcs - pcs.mean(axis=0)
+        r1 = ((pcs[1:] * pcs[:-1]).sum(axis=0) / (pcs * pcs).sum(axis=0)).mean()
+        n_eff = len(pcs) * (1 - r1**2) / (1 + r1**2)
+    error = L * np.sqrt(2. / n_eff)
+    gap_up = np.append(np.inf, L[:-1] - L[1:])
+    gap_down = np.append(L[:-1] - L[1:], np.inf)
+    return pd.DataFrame({'eigenvalue': L,
+                         'variance_fraction': solver.varianceFraction(neigs=neigs).values,
+                         'north_error': error,
+                         'separated': (gap_up > error) & (gap_down > error)},
+                        index=pd.Index(np.arange(len(L)), name='mode'))
+
+
+def _year_scatter(pcs, years):
+    # Cached per-year sums and scatter matrices of the PCs (year x mode x mode)
+    _, inverse = np.unique(years, return_inverse=True)
+    n_years = inverse.max() + 1
+    counts = np.bincount(inverse, minlength=n_years)
+    sums = np.zeros((n_years, pcs.shape[1]))
+    np.add.at(sums, inverse, pcs)
+    order = np.argsort(inverse, kind='stable')
+    blocks = np.split(pcs[order], np.cumsum(counts)[:-1])
+    scatter = np.stack([block.T @ block for block in blocks])
+    return counts, sums, scatter
+
+
+def _bootstrap_batch(draws, counts, sums, scatter, nmodes):
+    # Covariance of every resample from the cached year blocks, then one
+    # batched eigen decomposition of the small (mode x mode) matrices
+    n = draws @ counts
+    s = draws @ sums
+    cov = np.einsum('by,yij->bij', draws, scatter) - s[:, :, None] * s[:, None, :] / n[:, None, None]
+    cov /= (n - 1)[:, None, None]
+    lam, vec = np.linalg.eigh(cov)
+    lam, vec = lam[:, ::-1][:, :nmodes], vec[:, :, ::-1][:, :nmodes, :nmodes]
+    # Congruence of bootstrap EOF k with EOF k of the full record
+    return lam, np.abs(np.diagonal(vec, axis1=1, axis2=2))
+
+
+def bootstrap_eofs(solver, years, nmodes=14, nboot=1000, n_jobs=4, random_state=0):
+    """
+    Year-block bootstrap of the leading nmodes EOFs.
+
+    Whole years are resampled with replacement. The resampled covariance is
+    built inside the space of all solver.neofs EOFs from cached per-year
+    scatter matrices, so every resample costs one small eigen decomposition
+    instead of a new EOF analysis. Use a solver with clearly more modes than
+    nmodes (e.g. 30 for 14) so that patterns can rotate out of the leading set.
+
+    Returns bootstrap eigenvalues and congruences, both (nboot, nmodes).
+    """
+    counts, sums, scatter = _year_scatter(solver.pcs().values, np.asarray(years))
+    n_years = len(counts)
+    rng = np.random.default_rng(random_state)
+    draws = np.zeros((nboot, n_years))
+    np.add.at(draws, (np.arange(nboot)[:, None], rng.integers(0, n_years, (nboot, n_years))), 1)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        batches = list(pool.map(lambda d: _bootstrap_batch(d, counts, sums, scatter, nmodes),
+                                np.array_split(draws, n_jobs)))
+    return (np.concatenate([b[0] for b in batches]),
+            np.concatenate([b[1] for b in batches]))
+
+
+def eof_stability_report(solver, years, nmodes=14, nboot=1000, n_jobs=4, random_state=0):
+    """North test and bootstrap pattern stability per mode in one table."""
+    report = north_test(solver, neigs=nmodes)
+    lam, congruence = bootstrap_eofs(solver, years, nmodes, nboot, n_jobs, random_state)
+    report['eigenvalue_p05'] = np.percentile(lam, 5, axis=0)
+    report['eigenvalue_p95'] = np.percentile(lam, 95, axis=0)
+    report['congruence_median'] = np.median(congruence, axis=0)
+    report['congruence_p05'] = np.percentile(congruence, 5, axis=0)
+    return report
+
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:30:47 2026
+
+@author: Dirk
+
+
+Sensitivity grid over the whole processing chain
+
+    gph-low-pass-filter.py -> gph-calc-standardized-anomalies -> EOF.py
+    -> remove_short_wr.py -> wr-ninja-combi_v2.py / create_ninja_season_files.py
+
+Every combination of the parameter grid is split into stages. Stages with the
+same parameters up to their position in the chain (one filtered cube for all
+anomaly windows, one EOF run for all short filters, ...) are computed only
+once. Stages that do not depend on each other run in parallel worker
+processes. Every stage writes its result with the usual file name in
+data_folder/grid and is skipped if the file already exists.
+
+The regime numbers of every configuration are aligned with the first one, the
+output is one table with regime frequency and PV capacity factor deltas per
+configuration, season and regime.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.signal as signal
+import xarray as xr
+
+from eof_solver import TruncatedEof
+from ninja_cache import load_ninja
+from wr_cluster import align_regimes, composites, consensus_kmeans, relabel
+from wr_stats import remove_short as remove_short_episodes
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+grid_folder = data_folder / 'grid'
+f_gph = data_folder / 'gph-daily-mean.nc'
+f_ninja = data_folder / 'ninja/ninja_europe_pv_v1.1/ninja_pv_europe_v1.1_merra2.csv'
+f_out = data_folder / 'grid_comparison.csv'
+
+#Parameter grid: Butterworth filter (order, cutoff), anomaly window in days,
+#number of regimes and maximum length of removed short episodes
+grid = {
+    'filter': [(2, 0.1), (2, 0.25)],
+    'window': [30, 14],
+    'n_clusters': [7],
+    'short': [3, 10],
+}
+neofs = 14
+n_workers = 4
+
+
+
+######################Stages######################
+def filter_name(filter):
+    # (2, 0.1) -> 'lowpass_2_0-1' as in the existing file names
+    return 'lowpass_{}_{}'.format(filter[0], str(filter[1]).replace('.', '-'))
+
+
+def ninja_daily(out):
+    ninja = load_ninja(f_ninja)
+    ninja = ninja.resample('1D').mean()
+    ninja.index.name = 'time'
+    ninja.to_xarray().to_netcdf(out)
+
+
+def lowpass(out, filter):
+    z_all = xr.open_dataset(f_gph)
+    B, A = signal.butter(filter[0], filter[1], output='ba')
+    z_allf = xr.apply_ufunc(signal.filtfilt, B, A, z_all, kwargs=dict(axis=0))
+    z_allf.to_netcdf(out)
+
+
+def anomalies(out, f_in, window):
+    z_all = xr.open_dataset(f_in)
+    climatology_mean = z_all.rolling(time=window, center=True).mean().ffill(dim='time').bfill(dim='time').groupby("time.dayofyear").mean("time")
+    climatology_std = z_all.rolling(time=window, center=True).std().ffill(dim='time').bfill(dim='time').groupby("time.dayofyear").mean("time")
+    std_ano = xr.apply_ufunc(
+        lambda x, m, s: (x - m) / s,
+        z_all.groupby("time.dayofyear"),
+        climatology_mean,
+        climatology_std,
+    )
+    std_ano.to_netcdf(out)
+
+
+def regimes(out, f_in, f_reference=None, n_clusters=7):
+    z_all_ano_std = xr.open_dataset(f_in)['z']
+    coslat = np.cos(np.deg2rad(z_all_ano_std.coords['latitude'].values)).clip(0., 1.)
+    wgts = np.sqrt(coslat)[..., np.newaxis]
+    solver = TruncatedEof(z_all_ano_std, weights=wgts, neofs=neofs)
+    model, _, _ = consensus_kmeans(solver.pcs().values, n_clusters=n_clusters)
+    wr_time = xr.DataArray(model.labels_, dims=("time"), coords={"time": z_all_ano_std.time}, name='wr')
+
+    # Same regime numbers as the reference configuration (composites on this field)
+    if f_reference is not None:
+        wr_reference = xr.open_dataset(f_reference).wr.sel(time=wr_time.time)
+        mapping, _ = align_regimes(composites(z_all_ano_std.values, wr_reference.values),
+                                   composites(z_all_ano_std.values, wr_time.values))
+        wr_time = relabel(wr_time, mapping)
+    wr_time.to_netcdf(out)
+
+
+def remove_short(out, f_in, short=3, n_clusters=7):
+    # Episodes of at most short days become class n_clusters ('no regime')
+    wr = xr.open_dataset(f_in)
+    labels, _ = remove_short_episodes(wr.wr.values, short=short, fill=n_clusters)
+    wr['wr'] = wr.wr.copy(data=labels)
+    wr.to_netcdf(out)
+
+
+def stats(out, f_in, f_ninja_daily):
+    # Frequency and mean PV capacity factor delta (days of the regime minus
+    # all days of the season, averaged over the countries) per season and regime
+    wr = xr.open_dataset(f_in).wr
+    ninja = xr.open_dataset(f_ninja_daily).to_array('country')
+    time = np.intersect1d(wr.time.values, ninja.time.values)
+    wr, ninja = wr.sel(time=time), ninja.sel(time=time).mean('country').values
+    seasons = pd.Index(['DJF', 'MAM', 'JJA', 'SON'])
+    season = seasons.get_indexer(wr.time.dt.season.values)
+    k = int(wr.max()) + 1
+    code = season * k + wr.values
+    count = np.bincount(code, minlength=4 * k).reshape(4, k)
+    cf = np.bincount(code, weights=ninja, minlength=4 * k).reshape(4, k)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = cf / count - (cf.sum(axis=1) / count.sum(axis=1))[:, None]
+    table = pd.DataFrame({'season': np.repeat(seasons, k),
+                          'wr': np.tile(np.arange(k), 4),
+                          'frequency': (count / count.sum(axis=1, keepdims=True)).reshape(-1),
+                          'pv_delta': delta.reshape(-1)})
+    table.to_csv(out, index=False)
+
+
+
+######################Stage graph######################
+def build_graph(grid):
+    """
+    Stage graph of all configurations: key -> (function, output, inputs, parameters).
+    The key of a stage contains only its own and its upstream parameters, so
+    configurations sharing a prefix share the stage.
+    """
+    nodes = {}
+    final = {}
+
+    def node(key, func, out, inputs=(), **params):
+        nodes.setdefault(key, (func, grid_folder / out, list(inputs), params))
+        return key
+
+    ninja = node(('ninja',), ninja_daily, 'ninja_daily.nc')
+    reference = None
+    for config in itertools.product(*grid.values()):
+        flt, window, n_clusters, short = config
+        name = '{}days_{}'.format(window, filter_name(flt))
+        f = node(('filter', flt), lowpass, 'gph-daily-mean-{}.nc'.format(filter_name(flt)), filter=flt)
+        a = node(('anomaly', flt, window), anomalies, 'z_all_std_ano_{}.nc'.format(name), [f], window=window)
+        r_key = ('regimes', flt, window, n_clusters)
+        r_inputs = [a] if reference is None or reference == r_key else [a, reference]
+        r = node(r_key, regimes, 'wr_time-c{}_std_{}.nc'.format(n_clusters, name), r_inputs, n_clusters=n_clusters)
+        reference = r if reference is None else reference
+        s = node(('short', flt, window, n_clusters, short), remove_short,
+                 'wr_time-c{}_std_{}_short{}.nc'.format(n_clusters, name, short), [r],
+                 short=short, n_clusters=n_clusters)
+        final[config] = node(('stats',) + config, stats,
+                             'wr_stats-c{}_std_{}_short{}.csv'.format(n_clusters, name, short), [s, ninja])
+    return nodes, final
+
+
+def depth(nodes, key):
+    inputs = nodes[key][2]
+    return 0 if not inputs else 1 + max(depth(nodes, i) for i in inputs)
+
+
+def run_stage(func, out, inputs, params):
+    func(out, *inputs, **params)
+    return out
+
+
+def run_graph(nodes, n_workers=None):
+    # Level by level: all stages of one level only depend on earlier levels
+    levels = {}
+    for key in nodes:
+        levels.setdefault(depth(nodes, key), []).append(key)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        for level in sorted(levels):
+            todo = [key for key in levels[level] if not nodes[key][1].exists()]
+            runs = [pool.submit(run_stage, nodes[key][0], nodes[key][1],
+                                [nodes[i][1] for i in nodes[key][2]], nodes[key][3]) for key in todo]
+            for run in runs:
+                print(run.result())
+
+
+
+######################Run grid######################
+if __name__ == '__main__':
+    grid_folder.mkdir(parents=True, exist_ok=True)
+    nodes, final = build_graph(grid)
+    print(len(nodes), 'stages for', len(final), 'configurations')
+    run_graph(nodes, n_workers)
+
+    table = []
+    for config, key in final.items():
+        config_table = pd.read_csv(nodes[key][1])
+        for param, value in zip(grid, config):
+            config_table[param] = filter_name(value) if param == 'filter' else value
+        table.append(config_table)
+    table = pd.concat(table, ignore_index=True)
+    table.to_csv(f_out, index=False)
+    print(table.pivot_table(index=['season', 'wr'], columns=['filter', 'window', 'short'], values='frequency').round(3))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:37:17 2026
+
+@author: Dirk
+
+
+Binary cache of the renewables.ninja CSV files (hourly, one column per
+country). The CSV is parsed once into a directory next to it:
+
+    time.npy     int64 time stamps (ns since 1970)
+    values.npy   float32 capacity factors, one contiguous row per country
+    meta.json    column names, size, mtime and sha256 of the CSV
+
+Later runs memory-map the arrays instead of parsing the CSV again.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+
+
+def cache_folder(f_csv):
+    f_csv = Path(f_csv)
+    return f_csv.with_name(f_csv.stem + '.cache')
+
+
+def file_sha256(path, block_size=2**24):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def build_cache(f_csv, folder=None):
+    """Parse the CSV once and write the cache folder, returns the folder."""
+    f_csv = Path(f_csv)
+    folder = cache_folder(f_csv) if folder is None else Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    ninja = pd.read_csv(f_csv, header=0, parse_dates=[0], index_col=0)
+    stat = f_csv.stat()
+    np.save(folder / 'time.npy', ninja.index.values.astype('datetime64[ns]').astype(np.int64))
+    np.save(folder / 'values.npy', np.ascontiguousarray(ninja.to_numpy(dtype=np.float32).T))
+    meta = {'source': f_csv.name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(f_csv),
+            'index_name': ninja.index.name,
+            'columns': [str(c) for c in ninja.columns]}
+    # meta.json last: a cache without it is incomplete and rebuilt
+    (folder / 'meta.json').write_text(json.dumps(meta, indent=1))
+    return folder
+
+
+def _valid(f_csv, folder):
+    # size and mtime first, the checksum only if the file was touched or copied
+    f_meta = folder / 'meta.json'
+    if not f_meta.exists():
+        return False
+    meta = json.loads(f_meta.read_text())
+    stat = f_csv.stat()
+    if stat.st_size != meta['size']:
+        return False
+    if stat.st_mtime_ns != meta['mtime_ns']:
+        if file_sha256(f_csv) != meta['sha256']:
+            return False
+        meta['mtime_ns'] = stat.st_mtime_ns
+        f_meta.write_text(json.dumps(meta, indent=1))
+    return True
+
+
+def load_ninja(f_csv, folder=None, rebuild=False):
+    """
+    Ninja CSV as DataFrame (time x country, float32) from the binary cache,
+    built first if it is missing or does not match the CSV. The values are a
+    read-only memory map of the cache.
+    """
+    f_csv = Path(f_csv)
+    folder = cache_folder(f_csv) if folder is None else Path(folder)
+    if rebuild or not _valid(f_csv, folder):
+        build_cache(f_csv, folder)
+    meta = json.loads((folder / 'meta.json').read_text())
+    time = pd.DatetimeIndex(np.load(folder / 'time.npy').view('datetime64[ns]'), name=meta['index_name'])
+    values = np.load(folder / 'values.npy', mmap_mode='r')
+    return pd.DataFrame(values.T, index=time, columns=meta['columns'], copy=False)
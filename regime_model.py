@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:03:27 2026
+
+@author: Dirk
+
+
+Weather regime model: EOFs, weights, PC scaling and KMeans centroids of an
+EOF.py run, stored in one netCDF file. New standardized anomaly fields on the
+same grid are classified by projecting onto the stored EOFs and assigning the
+nearest centroid, without redoing the EOF analysis or the clustering.
+"""
+
+import numpy as np
+import xarray as xr
+
+
+
+class RegimeModel:
+
+    def __init__(self, eofs, mean, weights, centroids, pc_scale=None, config=None):
+        # eofs (mode, lat, lon): projection patterns of the weighted anomalies, NaN where missing
+        self.eofs = eofs
+        self.mean = mean
+        self.weights = weights
+        self.centroids = np.asarray(centroids)
+        self.npcs = self.centroids.shape[1]
+        self.pc_scale = np.ones(self.npcs) if pc_scale is None else np.asarray(pc_scale)
+        self.config = {} if config is None else dict(config)
+
+        self._valid = ~np.isnan(eofs.isel(mode=0).values.reshape(-1))
+        self._E = eofs.isel(mode=slice(0, self.npcs)).values.reshape(self.npcs, -1)[:, self._valid]
+        self._w = weights.values.reshape(-1)[self._valid]
+        self._m = mean.values.reshape(-1)[self._valid]
+
+
+    @classmethod
+    def from_solver(cls, solver, model, array, weights, pcscaling=0, **config):
+        """Regime model from an EOF solver and the KMeans fitted on its PCs."""
+        npcs = model.cluster_centers_.shape[1]
+        # For rotated EOFs the projection patterns differ from the EOFs
+        eofs = getattr(solver, 'projectionPatterns', solver.eofs)(neofs=npcs)
+        weights = xr.DataArray(np.broadcast_to(weights, eofs.shape[1:]),
+                               dims=eofs.dims[1:], coords=eofs.isel(mode=0, drop=True).coords)
+        # Training mean of the weighted field (TruncatedEof/IncrementalEof keep it)
+        if hasattr(solver, '_mean'):
+            mean = xr.full_like(weights, np.nan, dtype=eofs.dtype)
+            mean.values.reshape(-1)[~np.isnan(eofs.isel(mode=0).values.reshape(-1))] = solver._mean
+        else:
+            mean = (array * weights).mean(array.dims[0])
+        # Same scaling as solver.pcs(pcscaling=...)
+        pc_scale = np.sqrt(solver.eigenvalues(neigs=npcs).values) ** {0: 0, 1: -1, 2: 1}[pcscaling]
+        # Default softmax temperature 2 sigma^2, sigma^2 the mean squared
+        # distance per PC of the training days to their centroid
+        pcs = solver.pcs(npcs=npcs).values * pc_scale
+        d2 = ((pcs[:, None, :] - model.cluster_centers_[None, :, :])**2).sum(axis=2).min(axis=1)
+        config.update(n_clusters=model.n_clusters, npcs=npcs, pcscaling=pcscaling,
+                      temperature=2 * d2.mean() / npcs)
+        return cls(eofs, mean, weights, model.cluster_centers_, pc_scale, config)
+
+
+    ######################Input/Output######################
+    def to_dataset(self):
+        ds = xr.Dataset({'eofs': self.eofs.isel(mode=slice(0, self.npcs)),
+                         'mean': self.mean,
+                         'weights': self.weights,
+                         'centroids': (('wr', 'mode'), self.centroids),
+                         'pc_scale': (('mode',), self.pc_scale)},
+                        coords={'wr': np.arange(len(self.centroids))})
+        ds.attrs.update(self.config)
+        return ds
+
+    def save(self, path):
+        self.to_dataset().to_netcdf(path)
+
+    @classmethod
+    def load(cls, path):
+        ds = xr.open_dataset(path).load()
+        return cls(ds['eofs'], ds['mean'], ds['weights'], ds['centroids'].values,
+                   ds['pc_scale'].values, ds.attrs)
+
+
+    ######################Classification######################
+    def _samples(self, array):
+        # (sample, lat, lon) view of the field, extra dims like 'number' stacked with time
+        space = list(self.eofs.dims[1:])
+        for dim in space:
+            if dim not in array.dims or array[dim].shape != self.eofs[dim].shape \
+                    or not np.allclose(array[dim].values, self.eofs[dim].values):
+                raise ValueError('field is not on the grid of the regime model ({})'.format(dim))
+        other = [dim for dim in array.dims if dim not in space]
+        if len(other) == 1:
+            return array.transpose(other[0], *space)
+        return array.stack(sample=other).transpose('sample', *space)
+
+    def project(self, array, chunk_size=None):
+        """
+        (scaled) PCs of standardized anomalies (time, lat, lon), projected in
+        chunks of chunk_size time steps so lazily opened files are streamed.
+        """
+        samples = self._samples(array)
+        dim = samples.dims[0]
+        chunk_size = len(samples) if chunk_size is None else chunk_size
+        pcs = np.empty((len(samples), self.npcs))
+        for i in range(0, len(samples), chunk_size):
+            flat = np.asarray(samples.isel({dim: slice(i, i + chunk_size)}).values)
+            flat = flat.reshape(len(flat), -1)[:, self._valid]
+            pcs[i:i + chunk_size] = ((flat * self._w - self._m) @ self._E.T) * self.pc_scale
+        pcs = xr.DataArray(pcs, dims=(dim, 'mode'),
+                           coords={dim: samples[dim], 'mode': np.arange(self.npcs)}, name='pcs')
+        return pcs.unstack('sample') if dim == 'sample' else pcs
+
+    def distances(self, pcs):
+        # Squared euclidean distance of every day to every centroid
+        pcs = np.asarray(pcs)
+        return ((pcs**2).sum(axis=-1)[..., None] - 2 * pcs @ self.centroids.T
+                + (self.centroids**2).sum(axis=1)).clip(0)
+
+    def predict(self, array, chunk_size=None):
+        """Regime label per time step (and member), in the wr_time format of EOF.py."""
+        pcs = self.project(array, chunk_size)
+        pcs = pcs.transpose(*[d for d in pcs.dims if d != 'mode'], 'mode')
+        return xr.DataArray(self.distances(pcs.values).argmin(axis=-1), dims=pcs.dims[:-1],
+                            coords={d: pcs[d] for d in pcs.dims[:-1]}, name='wr')
+
+    def probabilities(self, distances, temperature=None):
+        # Softmax over -d^2 / temperature, i.e. the responsibilities of an
+        # isotropic Gaussian mixture with equal weights for temperature = 2 sigma^2
+        temperature = self.config.get('temperature', 1.) if temperature is None else temperature
+        logits = -np.asarray(distances) / temperature
+        p = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return p / p.sum(axis=-1, keepdims=True)
+
+    def membership(self, array, temperature=None, chunk_size=None):
+        """Membership probability (time, wr) of every regime, argmax is predict()."""
+        pcs = self.project(array, chunk_size)
+        pcs = pcs.transpose(*[d for d in pcs.dims if d != 'mode'], 'mode')
+        p = self.probabilities(self.distances(pcs.values), temperature)
+        return xr.DataArray(p, dims=pcs.dims[:-1] + ('wr',),
+                            coords=dict({d: pcs[d] for d in pcs.dims[:-1]}, wr=np.arange(len(self.centroids))),
+                            name='membership')
+
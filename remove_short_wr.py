@@ -15,6 +15,8 @@ Check duration of weather regime
 from pathlib import Path
 import xarray as xr
 
+from wr_stats import episode_file, episodes, remove_short, save_episodes
+
 
 
 ######################Load Datasets#################
@@ -25,128 +27,25 @@ file_wr = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1.nc'
 wr = xr.open_dataset(file_wr)
 f_out = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1_short3.nc'
 
+#maximum length of removed episodes and label of the removed days
+short = 3
+no_regime = 7
+
+
+#######Remove all days where weather regime lasts shorter than short+1 days
+#Not identical to the old per-duration loops: short3 files differ in the first
+#and last episode of the record (the loops wrapped around at day 0 and never
+#checked the last days) and the printed counts differ because the loops also
+#counted runs of 7 created by the previous pass
+labels, removed = remove_short(wr.wr.values, short=short, fill=no_regime)
+wr['wr'] = wr.wr.copy(data=labels)
+
+#number of removed episodes per length (1 day, 2 days, ...)
+for length in range(1, short + 1):
+    print(length, 'days:', removed[length])
 
-#######Remove all days where weather regime lasts shorter than
-alone = 0
-twodays = 0
-threedays = 0
-fourdays = 0
-fivedays = 0
-sixdays = 0
-sevendays = 0
-eightdays = 0
-ninedays = 0
-tendays = 0
-rest = 0
-
-for i in range(0,len(wr.wr.values)-1):
-    if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] != wr.wr.values[i+1]:
-        # print(i)
-        alone = alone +1
-        wr.wr[i] = 7
-    
-for i in range(0,len(wr.wr.values)-2):
-    if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]!=wr.wr.values[i+2]:
-      # print(i)
-      twodays = twodays +1 
-      wr.wr[i] = 7
-      wr.wr[i+1] = 7
-      
-for i in range(0,len(wr.wr.values)-3):
-    if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]!=wr.wr.values[i+3]:
-        # print(i)
-        threedays = threedays +1
-        wr.wr[i] = 7
-        wr.wr[i+1] = 7
-        wr.wr[i+2] = 7
-      
-# for i in range(0,len(wr.wr.values)-4):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4]:
-#         # print(i)
-#         fourdays = fourdays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7
-        
-# for i in range(0,len(wr.wr.values)-5):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5]:
-#         # print(i)
-#         fivedays = fivedays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7        
- 
-# for i in range(0,len(wr.wr.values)-6):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5] and wr.wr.values[i]!=wr.wr.values[i+6]:
-#         # print(i)
-#         sixdays = sixdays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7
-#         wr.wr[i+5] = 7
-
-# for i in range(0,len(wr.wr.values)-7):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5] and wr.wr.values[i]!=wr.wr.values[i+6] and wr.wr.values[i]!=wr.wr.values[i+7]:
-#         # print(i)
-#         sevendays = sevendays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7
-#         wr.wr[i+5] = 7
-#         wr.wr[i+6] = 7
-        
-       
-# for i in range(0,len(wr.wr.values)-8):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5] and wr.wr.values[i]!=wr.wr.values[i+6] and wr.wr.values[i]!=wr.wr.values[i+7] and wr.wr.values[i]!=wr.wr.values[i+8]:
-#         # print(i)
-#         eightdays = eightdays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7
-#         wr.wr[i+5] = 7
-#         wr.wr[i+6] = 7
-#         wr.wr[i+7] = 7
-        
-# for i in range(0,len(wr.wr.values)-9):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5] and wr.wr.values[i]!=wr.wr.values[i+6] and wr.wr.values[i]!=wr.wr.values[i+7] and wr.wr.values[i]!=wr.wr.values[i+8] and wr.wr.values[i]!=wr.wr.values[i+9]:
-#         # print(i)
-#         ninedays = ninedays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7
-#         wr.wr[i+5] = 7
-#         wr.wr[i+6] = 7
-#         wr.wr[i+7] = 7
-#         wr.wr[i+8] = 7
-        
-        
-# for i in range(0,len(wr.wr.values)-10):
-#     if wr.wr.values[i] != wr.wr.values[i-1] and wr.wr.values[i] == wr.wr.values[i+1] and wr.wr.values[i]==wr.wr.values[i+2] and wr.wr.values[i]==wr.wr.values[i+3] and wr.wr.values[i]!=wr.wr.values[i+4] and wr.wr.values[i]!=wr.wr.values[i+5] and wr.wr.values[i]!=wr.wr.values[i+6] and wr.wr.values[i]!=wr.wr.values[i+7] and wr.wr.values[i]!=wr.wr.values[i+8] and wr.wr.values[i]!=wr.wr.values[i+9] and wr.wr.values[i]!=wr.wr.values[i+10]:
-#         # print(i)
-#         tendays = tendays +1
-#         wr.wr[i] = 7
-#         wr.wr[i+1] = 7
-#         wr.wr[i+2] = 7
-#         wr.wr[i+3] = 7        
-#         wr.wr[i+4] = 7
-#         wr.wr[i+5] = 7
-#         wr.wr[i+6] = 7
-#         wr.wr[i+7] = 7
-#         wr.wr[i+8] = 7
-#         wr.wr[i+9] = 7
-        
-remove = alone + 2*twodays + 3*threedays + 4*fourdays + 5*fivedays + 6*sixdays + 7*sevendays +8*eightdays+9*ninedays+10*tendays
-rest = len(wr.wr.values) - (alone + 2*twodays + 3*threedays + 4*fourdays + 5*fivedays + 6*sixdays + 7*sevendays +8*eightdays+9*ninedays+10*tendays)
+remove = int((removed * range(short + 1)).sum())
+rest = len(wr.wr.values) - remove
 
 wr.to_netcdf(f_out)
+save_episodes(episodes(wr.wr), episode_file(f_out))
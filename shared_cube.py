@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:40:52 2026
+
+@author: Dirk
+
+
+Put a numpy array into shared memory so worker processes can read the
+anomaly cube without each receiving a pickled copy.
+"""
+
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+
+
+
+@contextmanager
+def shared_array(values):
+    """Copy values once into shared memory, yield the spec for the workers."""
+    values = np.ascontiguousarray(values)
+    shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    try:
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        yield (shm.name, values.shape, values.dtype.str)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@contextmanager
+def attach_array(spec):
+    """
+    Read-only view of a shared array inside a worker process. Basic slices
+    of it are views as well, fancy indexing (np.take, cube[index]) copies.
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    try:
+        yield array
+    finally:
+        del array
+        try:
+            shm.close()
+        except BufferError:
+            # a view is still alive in the worker, the mapping goes with the process
+            pass
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:27:33 2026
+
+@author: Dirk
+
+
+Align the regime numbers of a new run (other filter, anomaly window, rerun of
+EOF.py) with a reference run. The composite correlation of all regime pairs is
+computed in one step and the optimal one-to-one matching replaces the
+argmax per row of old/correlation_*.py. The relabelled wr_time file is saved.
+"""
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from wr_cluster import align_regimes, composites, relabel
+
+
+
+######################Load Datasets#################
+
+data_folder = Path("../data/")
+
+#######Reference run
+filename_std_ano = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+z_all_std_ano_1 = xr.open_dataset(filename_std_ano)['z']
+
+file_wr = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1.nc'
+wr_1 = xr.open_dataset(file_wr)
+
+#######Run to align
+filename_std_ano = data_folder / 'z_all_std_ano_14days_lowpass_2_0-25.nc'
+z_all_std_ano_2 = xr.open_dataset(filename_std_ano)['z']
+
+file_wr = data_folder / 'wr_time-c7_std_14days_lowpass_2_0-25.nc'
+wr_2 = xr.open_dataset(file_wr)
+f_out = data_folder / 'wr_time-c7_std_14days_lowpass_2_0-25_aligned.nc'
+
+#labels that keep their number, e.g. [7] for 'no regime' in the short files
+fixed = []
+
+
+
+#########Align###########
+comp_1 = composites(z_all_std_ano_1.sel(time=wr_1.time).values, wr_1.wr.values)
+comp_2 = composites(z_all_std_ano_2.sel(time=wr_2.time).values, wr_2.wr.values)
+mapping, corr = align_regimes(comp_1, comp_2, fixed=fixed)
+
+wr_aligned = wr_2.copy()
+wr_aligned['wr'] = relabel(wr_2.wr, mapping)
+wr_aligned.to_netcdf(f_out)
+
+table = pd.DataFrame({'wr_new': np.arange(len(mapping)),
+                      'wr_reference': mapping,
+                      'corr': [corr[j, i] if j < len(corr) else np.nan for i, j in enumerate(mapping)]})
+print(table)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:28:14 2026
+
+@author: Dirk
+
+
+Classifiability index (Michelangeli et al. 1995) of the KMeans weather
+regimes for k = 2..10, compared with red noise surrogates of the PCs.
+"""
+
+from pathlib import Path
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+from eof_solver import TruncatedEof
+from wr_cluster import classifiability
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+f_out = data_folder / 'classifiability_30days_lowpass_2_0-1.csv'
+fig_out = data_folder / 'fig/classifiability_30days_lowpass_2_0-1.png'
+
+npcs = 14
+ks = range(2, 11)
+n_partitions = 30
+n_surrogates = 20
+
+
+
+######################Classifiability######################
+if __name__ == '__main__':
+    z_all_ano_std = xr.open_dataset(filename)['z']
+    coslat = np.cos(np.deg2rad(z_all_ano_std.coords['latitude'].values)).clip(0., 1.)
+    wgts = np.sqrt(coslat)[..., np.newaxis]
+    solver = TruncatedEof(z_all_ano_std, weights=wgts, neofs=npcs)
+
+    table = classifiability(solver.pcs().values, ks=ks, n_partitions=n_partitions, n_surrogates=n_surrogates)
+    table.to_csv(f_out)
+    print(table.round(3))
+
+
+    ######################Plot results#################
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.fill_between(table.index, table.red_noise_p05, table.red_noise_p95, color='grey', alpha=0.4, label='red noise 5-95%')
+    ax.plot(table.index, table.red_noise_p50, '--', color='grey')
+    ax.plot(table.index, table.classifiability, '-o', color='black', label='ERA5')
+    ax.set_xlabel('number of clusters, k')
+    ax.set_ylabel('classifiability index')
+    ax.set_xticks(list(ks))
+    ax.legend(frameon=False)
+    fig.savefig(fig_out)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:25:16 2026
+
+@author: Dirk
+
+
+Classify other datasets (reanalyses, climate model output, ensemble
+hindcasts) with the weather regimes of EOF.py.
+
+Every file has to contain standardized 500 hPa anomalies on the grid of the
+regime model. The files are handled by a pool of worker processes, each file
+is projected onto the stored EOFs in chunks and every day is assigned to the
+nearest centroid. The labels are written in the wr_time format, the soft
+regime membership probabilities in a wr_membership file.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import xarray as xr
+
+from regime_model import RegimeModel
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+f_model = data_folder / 'wr_model-c7_std_30days_lowpass_2_0-1.nc'
+#files to classify and name of the anomaly variable
+files = sorted((data_folder / 'classify').glob('*.nc'))
+variable = 'z'
+out_folder = data_folder / 'classify/wr_time'
+chunk_size = 365
+overwrite = False
+#also write the soft membership probabilities (time x wr)
+write_membership = True
+
+
+
+######################Functions######################
+regime_model = None
+
+def load_model(path):
+    # Once per worker process
+    global regime_model
+    regime_model = RegimeModel.load(path)
+
+
+def classify(f_in):
+    f_out = out_folder / ('wr_time-c7_' + f_in.name)
+    if f_out.exists() and not overwrite:
+        return f_out
+    with xr.open_dataset(f_in) as ds:
+        # Labels are the argmax of the membership, one projection for both
+        membership = regime_model.membership(ds[variable], chunk_size=chunk_size)
+    wr_time = membership.argmax('wr').rename('wr')
+    wr_time.attrs['source'] = f_in.name
+    wr_time.to_netcdf(f_out)
+    if write_membership:
+        membership.to_netcdf(out_folder / ('wr_membership-c7_' + f_in.name))
+    return f_out
+
+
+
+######################Classify all files######################
+if __name__ == '__main__':
+    out_folder.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(initializer=load_model, initargs=(f_model,)) as pool:
+        for f_out in pool.map(classify, files):
+            print(f_out)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:35:24 2026
+
+@author: Dirk
+
+
+Interannual changes of the weather regime frequencies: running 10-year
+frequencies and linear trends per decade with block-permutation p-values,
+for the whole year and every season.
+"""
+
+from pathlib import Path
+import matplotlib.pyplot as plt
+import pandas as pd
+import xarray as xr
+
+from wr_stats import frequency_trends, rolling_frequency, seasons, year_counts
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+file_wr = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1_short10.nc'
+f_out = data_folder / 'wr_frequency_trends_30days_lowpass_2_0-1_short10.csv'
+fig_out = data_folder / 'fig/wr_rolling_frequency_30days_lowpass_2_0-1_short10.png'
+
+window = 10
+n_permutations = 5000
+#years per shuffled block of the permutation test
+block = 5
+
+
+
+######################Trends######################
+if __name__ == '__main__':
+    wr = xr.open_dataset(file_wr).wr
+    n_regimes = int(wr.max()) + 1
+
+    table = []
+    for season in [None] + seasons:
+        counts = year_counts(wr, season=season, n_regimes=n_regimes)
+        trend = frequency_trends(counts, n_permutations=n_permutations, block=block)
+        trend['season'] = 'year' if season is None else season
+        table.append(trend.reset_index())
+    table = pd.concat(table, ignore_index=True)
+    table.to_csv(f_out, index=False)
+    print(table.pivot(index='wr', columns='season', values='trend_per_decade').round(4))
+
+
+    ######################Plot results#################
+    fig, axs = plt.subplots(5, 1, figsize=(8, 14), sharex=True)
+    for ax, season in zip(axs, [None] + seasons):
+        frequency = rolling_frequency(year_counts(wr, season=season, n_regimes=n_regimes), window)
+        for i in frequency.wr.values:
+            ax.plot(frequency.year, frequency.sel(wr=i) * 100, label='no regime' if i == 7 else 'WR' + str(i))
+        ax.set_ylabel('frequency (%)')
+        ax.set_title('year' if season is None else season)
+    axs[0].legend(ncol=4, frameon=False)
+    axs[-1].set_xlabel('central year of the {}-year window'.format(window))
+    fig.savefig(fig_out)
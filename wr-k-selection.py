@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:20:57 2026
+
+@author: Dirk
+
+
+Number of weather regimes: elbow inertia, silhouette coefficient and
+Calinski-Harabasz index of KMeans on the leading PCs for all k, fitted in
+parallel. Replaces the serial elbow() and silhouette() of EOF.py.
+"""
+
+from pathlib import Path
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+from eof_solver import TruncatedEof
+from wr_cluster import k_selection
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+filename = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+f_out = data_folder / 'k_selection_30days_lowpass_2_0-1.csv'
+fig_out = data_folder / 'fig/k_selection_30days_lowpass_2_0-1.png'
+
+npcs = 14
+ks = range(1, 11)
+#days in the silhouette subsample, exact=True uses all days
+silhouette_sample = 3000
+exact = False
+
+
+
+######################Cluster number selection######################
+if __name__ == '__main__':
+    z_all_ano_std = xr.open_dataset(filename)['z']
+    coslat = np.cos(np.deg2rad(z_all_ano_std.coords['latitude'].values)).clip(0., 1.)
+    wgts = np.sqrt(coslat)[..., np.newaxis]
+    solver = TruncatedEof(z_all_ano_std, weights=wgts, neofs=npcs)
+
+    scores = k_selection(solver.pcs().values, ks=ks, silhouette_sample=silhouette_sample, exact=exact)
+    scores.to_csv(f_out)
+    print(scores)
+
+
+    ######################Plot results#################
+    f, ax = plt.subplots(ncols=3, figsize=(18, 5))
+    for i, col in enumerate(['inertia', 'silhouette', 'calinski_harabasz']):
+        scores[col].plot(ax=ax[i], style='-o', color='black')
+        ax[i].set_xlabel('number of clusters, k')
+        ax[i].set_ylabel(col.replace('_', '-'))
+        ax[i].set_xticks(list(ks))
+    f.savefig(fig_out)
@@ -11,10 +11,11 @@ Created on Fri Oct  2 12:52:46 2020
 from pathlib import Path
 #import cartopy.crs as ccrs
 # import matplotlib.pyplot as plt
-import pandas as pd
 # from datetime import datetime, timedelta
 import xarray as xr
 
+from ninja_cache import load_ninja
+
 
 
 ######################Load Datasets#################
@@ -28,7 +29,7 @@ wr_time = xr.open_dataset(f_in)
 
 #Load renewable ninja dataset and convert it to xarray
 filename = data_folder / 'ninja/ninja_europe_pv_v1.1/ninja_pv_europe_v1.1_merra2.csv'
-ninja = pd.read_csv(filename, header=0, parse_dates=[0], index_col=0, squeeze=True)
+ninja = load_ninja(filename)
 ninja = ninja.to_xarray()
 
 
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:36:12 2026
+
+@author: Dirk
+
+
+Lagged composites around weather regime onsets: standardized 500 hPa
+anomalies and PV capacity factor anomalies from day -5 to day +10 after the
+first day of every regime episode (taken from the episode table).
+"""
+
+from pathlib import Path
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from ninja_cache import load_ninja
+from wr_stats import lagged_composites, load_episodes
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+file_wr = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1_short3.nc'
+filename_std_ano = data_folder / 'z_all_std_ano_30days_lowpass_2_0-1.nc'
+file_ninja = data_folder / 'ninja/ninja_europe_pv_v1.1/ninja_pv_europe_v1.1_merra2.csv'
+f_out = data_folder / 'wr_onset_composites_30days_lowpass_2_0-1_short3.nc'
+fig_out = data_folder / 'fig/wr_onset_pv_30days_lowpass_2_0-1_short3.png'
+
+lags = np.arange(-5, 11)
+n_clusters = 7
+#only onsets of episodes lasting at least min_length days
+min_length = 1
+chunk_size = 365
+
+
+
+######################Onsets#################
+episodes = load_episodes(file_wr)
+#first episode has no observed onset, 'no regime' (7) is no regime onset
+episodes = episodes[(episodes.preceding >= 0) & (episodes.wr < n_clusters) & (episodes.length >= min_length)]
+
+
+def onset_index(time):
+    # Onset days as indices of a time axis, onsets outside of it are dropped
+    index = pd.DatetimeIndex(time).get_indexer(pd.DatetimeIndex(episodes.start.values).normalize())
+    return index[index >= 0], episodes.wr.values[index >= 0]
+
+
+
+######################Composites#################
+#500 hPa anomalies, read from the file in chunks of chunk_size days
+z_all_std_ano = xr.open_dataset(filename_std_ano)['z']
+z_time = z_all_std_ano.time.dt.floor('D').values
+gph, gph_onsets = lagged_composites(z_all_std_ano, *onset_index(z_time), lags=lags,
+                                    n_regimes=n_clusters, chunk_size=chunk_size)
+
+#daily PV capacity factor anomalies (daily climatology removed) per country
+ninja = load_ninja(file_ninja)
+ninja = ninja.resample('1D').mean()
+ninja = ninja - ninja.groupby(ninja.index.dayofyear).transform('mean')
+cf = xr.DataArray(ninja.to_numpy(), dims=('time', 'country'),
+                  coords={'time': ninja.index.values, 'country': ninja.columns.values}, name='cf_anomaly')
+pv, pv_onsets = lagged_composites(cf, *onset_index(ninja.index), lags=lags, n_regimes=n_clusters)
+
+xr.Dataset({'z': gph, 'cf_anomaly': pv,
+            'onsets_z': gph_onsets, 'onsets_cf': pv_onsets}).to_netcdf(f_out)
+
+
+
+######################Plot results#################
+fig, ax = plt.subplots(figsize=(8, 5))
+for i in range(n_clusters):
+    ax.plot(lags, pv.sel(wr=i).mean('country'), '-o', label='WR' + str(i))
+ax.axvline(0, color='grey', linewidth=0.8)
+ax.axhline(0, color='grey', linewidth=0.8)
+ax.set_xlabel('days after regime onset')
+ax.set_ylabel('PV capacity factor anomaly (country mean)')
+ax.legend(ncol=4, frameon=False)
+fig.savefig(fig_out)
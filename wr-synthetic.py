@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:34:43 2026
+
+@author: Dirk
+
+
+Synthetic ensemble of PV capacity factor years from a seasonal semi-Markov
+chain of the weather regimes.
+
+The regime chain is fitted to the wr_time series, n_years synthetic years
+are simulated together and every synthetic day gets the country capacity
+factors of a random historical day of the same regime and season. Seasonal
+mean capacity factor percentiles of the synthetic years are compared with the
+spread of the historical years.
+"""
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from ninja_cache import load_ninja
+from wr_stats import seasons, time_codes
+from wr_synthetic import RegimeGenerator, resample_days
+
+
+
+######################Dataset#################
+data_folder = Path("../data/")
+file_wr = data_folder / 'wr_time-c7_std_30days_lowpass_2_0-1_short3.nc'
+file_ninja = data_folder / 'ninja/ninja_europe_pv_v1.1/ninja_pv_europe_v1.1_merra2.csv'
+f_out = data_folder / 'synthetic_cf_percentiles_30days_lowpass_2_0-1_short3.csv'
+
+#'semi-markov' (episode lengths from the historical episodes) or 'markov'
+mode = 'semi-markov'
+n_years = 5000
+percentiles = [1, 5, 50, 95, 99]
+
+
+
+######################Load Datasets#################
+wr = xr.open_dataset(file_wr).wr
+ninja = load_ninja(file_ninja)
+ninja = ninja.resample('1D').mean()
+
+#days with regime and capacity factors
+time = np.intersect1d(wr.time.values, ninja.index.values)
+wr = wr.sel(time=time)
+cf = ninja.loc[time].to_numpy(dtype='float32')
+
+
+
+######################Synthetic years######################
+generator = RegimeGenerator(mode=mode).fit(wr)
+season = RegimeGenerator.calendar(1)
+synthetic = generator.simulate(1, n_realizations=n_years)
+index = resample_days(synthetic, season, wr)
+
+#seasonal mean capacity factor (year, season, country) of every synthetic year
+synthetic_mean = np.stack([cf[index[:, season == s]].mean(axis=1) for s in range(4)], axis=1)
+
+#historical seasonal means of every year (DJF with the December of the same year)
+hist_season, _, _ = time_codes(time)
+hist = pd.DataFrame(cf, columns=ninja.columns)
+hist['year'] = pd.DatetimeIndex(time).year
+hist['season'] = np.array(seasons)[hist_season]
+hist_mean = hist.groupby(['year', 'season']).mean()
+
+
+
+######################Percentiles######################
+table = []
+for s, name in enumerate(seasons):
+    p = np.percentile(synthetic_mean[:, s], percentiles, axis=0)
+    for q, row in zip(percentiles, p):
+        table.append(pd.Series(row, index=ninja.columns, name=(name, 'synthetic_p{:02d}'.format(q))))
+    h = hist_mean.xs(name, level='season')
+    table.append(h.min().rename((name, 'historical_min')))
+    table.append(h.max().rename((name, 'historical_max')))
+table = pd.DataFrame(table)
+table.index = pd.MultiIndex.from_tuples(table.index, names=['season', 'statistic'])
+table.to_csv(f_out)
+print(table.round(3))
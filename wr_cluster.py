@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:20:57 2026
+
+@author: Dirk
+
+
+Clustering tools for the weather regime classification on the leading PCs
+of EOF.py.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.signal import lfilter
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, silhouette_score
+
+
+
+######################Cluster number selection######################
+def stratified_sample(labels, size, random_state=0):
+    """Indices of a random subsample with the cluster proportions of labels."""
+    labels = np.asarray(labels)
+    if size >= len(labels):
+        return np.arange(len(labels))
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(len(labels))
+    order = order[np.argsort(labels[order], kind='stable')]
+    counts = np.bincount(labels)
+    quota = np.maximum(np.round(counts * size / len(labels)), 1)
+    # rank of every sample inside its cluster after the shuffle
+    rank = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.sort(order[rank < quota[labels[order]]])
+
+
+def _score_k(pcs, k, silhouette_sample, random_state):
+    model = KMeans(n_clusters=k, n_init=10, random_state=random_state).fit(pcs)
+    scores = {'k': k, 'inertia': model.inertia_, 'silhouette': np.nan, 'calinski_harabasz': np.nan}
+    if k > 1:
+        index = np.arange(len(pcs)) if silhouette_sample is None else \
+            stratified_sample(model.labels_, silhouette_sample, random_state)
+        scores['silhouette'] = silhouette_score(pcs[index], model.labels_[index])
+        scores['calinski_harabasz'] = calinski_harabasz_score(pcs, model.labels_)
+    return scores
+
+
+def k_selection(pcs, ks=range(1, 11), silhouette_sample=3000, exact=False, n_jobs=None, random_state=0):
+    """
+    Elbow inertia, silhouette and Calinski-Harabasz index for every k.
+
+    All k are fitted concurrently in a process pool. The O(n^2) silhouette is
+    computed on a stratified subsample of silhouette_sample days unless
+    exact=True.
+    """
+    pcs = np.asarray(pcs)
+    sample = None if exact else silhouette_sample
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        scores = list(pool.map(_score_k, [pcs] * len(ks), ks, [sample] * len(ks), [random_state] * len(ks)))
+    return pd.DataFrame(scores).set_index('k')
+
+
+
+
+######################Classifiability index######################
+def partition_similarity(centroids):
+    """
+    Classifiability index (Michelangeli et al. 1995) of a set of partitions.
+
+    centroids (partition, regime, mode) in PC space, where the anomaly
+    correlation of two patterns is the cosine of their PC vectors. For every
+    pair of partitions the worst best-match correlation of their regimes is
+    taken, the index is the mean over all pairs (1 = identical partitions).
+    """
+    c = centroids / np.sqrt((centroids**2).sum(axis=-1, keepdims=True))
+    acc = np.einsum('aid,bjd->abij', c, c)
+    similarity = acc.max(axis=3).min(axis=2)
+    n = len(c)
+    return (similarity.sum() - np.trace(similarity)) / (n * (n - 1))
+
+
+def red_noise(pcs, n_surrogates, random_state=0):
+    """AR(1) surrogates (surrogate, time, mode) with the lag-1 autocorrelation and variance of every PC."""
+    pcs = np.asarray(pcs)
+    anomaly = pcs - pcs.mean(axis=0)
+    r = (anomaly[1:] * anomaly[:-1]).sum(axis=0) / (anomaly * anomaly).sum(axis=0)
+    rng = np.random.default_rng(random_state)
+    noise = rng.standard_normal((n_surrogates,) + pcs.shape)
+    surrogates = np.empty_like(noise)
+    for j in range(pcs.shape[1]):
+        surrogates[:, :, j] = lfilter([1.], [1., -r[j]], noise[:, :, j], axis=1)
+    return surrogates * anomaly.std(axis=0) / surrogates.std(axis=1, keepdims=True)
+
+
+def _classifiability_k(pcs, k, n_partitions, random_state):
+    centroids = np.stack([KMeans(n_clusters=k, n_init=1, random_state=random_state + i).fit(pcs).cluster_centers_
+                          for i in range(n_partitions)])
+    return partition_similarity(centroids)
+
+
+def classifiability(pcs, ks=range(2, 11), n_partitions=30, n_surrogates=20, n_jobs=None, random_state=0):
+    """
+    Classifiability index per k of the PCs and of red noise surrogates.
+
+    Every (k, dataset) combination is a task for the process pool with
+    n_partitions seeded KMeans fits. Returns the index of the data and the
+    5, 50 and 95 percentile of the surrogate indices per k. A k is better than
+    noise where the data index lies above the surrogate 95 percentile.
+    """
+    pcs = np.asarray(pcs)
+    data = [pcs] + list(red_noise(pcs, n_surrogates, random_state))
+    tasks = [(d, k) for k in ks for d in range(len(data))]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        index = list(pool.map(_classifiability_k, [data[d] for d, k in tasks], [k for d, k in tasks],
+                              [n_partitions] * len(tasks), [random_state] * len(tasks)))
+    index = np.array(index).reshape(len(ks), len(data))
+    table = pd.DataFrame({'classifiability': index[:, 0],
+                          'red_noise_p05': np.percentile(index[:, 1:], 5, axis=1),
+                          'red_noise_p50': np.percentile(index[:, 1:], 50, axis=1),
+                          'red_noise_p95': np.percentile(index[:, 1:], 95, axis=1)},
+                         index=pd.Index(list(ks), name='k'))
+    table['significant'] = table.classifiability > table.red_noise_p95
+    return table
+
+
+
+######################Consensus clustering######################
+def match_centroids(centroids, reference):
+    """Permutation p so that centroids[p] lines up with reference (Hungarian)."""
+    cost = ((reference[:, None, :] - centroids[None, :, :])**2).sum(axis=2)
+    return linear_sum_assignment(cost)[1]
+
+
+def _fit_seed(pcs, n_clusters, seed):
+    model = KMeans(n_clusters=n_clusters, n_init=1, random_state=seed).fit(pcs)
+    return model.cluster_centers_, model.labels_
+
+
+def consensus_kmeans(pcs, n_clusters=7, n_runs=50, n_jobs=None, random_state=0):
+    """
+    KMeans with n_runs seeds and the most representative solution.
+
+    The runs are fitted on threads (the KMeans iterations release the GIL, so
+    this also works inside EOF.py). All runs are aligned to the lowest
+    inertia run with the Hungarian algorithm on their centroids. The run that
+    agrees best with all others is kept and its regimes are numbered by
+    decreasing frequency, so reruns give the same regime IDs.
+
+    Returns the representative fitted KMeans, the per day confidence (share of
+    runs with the same label) and the per regime stability (mean Jaccard index
+    of the regime over all runs).
+    """
+    pcs = np.asarray(pcs)
+    seeds = random_state + np.arange(n_runs)
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        runs = list(pool.map(lambda seed: _fit_seed(pcs, n_clusters, seed), seeds))
+    centroids = np.stack([r[0] for r in runs])
+    labels = np.stack([r[1] for r in runs])
+
+    # Align all runs to the run with the smallest inertia
+    inertia = [((pcs - c[l])**2).sum() for c, l in zip(centroids, labels)]
+    reference = centroids[np.argmin(inertia)]
+    for r in range(n_runs):
+        p = match_centroids(centroids[r], reference)
+        centroids[r] = centroids[r][p]
+        labels[r] = np.argsort(p)[labels[r]]
+
+    # Most representative run: highest mean day-by-day agreement
+    onehot = np.eye(n_clusters, dtype=np.float32)[labels]
+    agreement = np.einsum('rnk,snk->rs', onehot, onehot) / len(pcs)
+    best = np.argmax(agreement.sum(axis=1))
+
+    # Number regimes by decreasing frequency and refit from these centroids
+    order = np.argsort(np.bincount(labels[best], minlength=n_clusters))[::-1]
+    model = KMeans(n_clusters=n_clusters, init=centroids[best][order], n_init=1).fit(pcs)
+
+    counts = onehot.sum(axis=0)
+    confidence = counts[np.arange(len(pcs)), order[model.labels_]] / n_runs
+    best_onehot = onehot[best]
+    intersection = np.einsum('nk,rnk->rk', best_onehot, onehot)
+    union = best_onehot.sum(axis=0) + onehot.sum(axis=1) - intersection
+    stability = (intersection / union).mean(axis=0)
+    return model, confidence, stability[order]
+
+
+
+######################Regime alignment######################
+def composites(field, labels, n_regimes=None):
+    """Mean field (regime, ...) of every regime as one matrix product."""
+    values = np.asarray(field)
+    labels = np.asarray(labels)
+    k = labels.max() + 1 if n_regimes is None else n_regimes
+    onehot = np.eye(k, dtype=values.dtype)[labels]
+    flat = values.reshape(len(values), -1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        comp = (onehot.T @ flat) / onehot.sum(axis=0)[:, None]
+    return comp.reshape((k,) + values.shape[1:])
+
+
+def pattern_correlation(comp_a, comp_b):
+    """Pearson correlation of all pairs of composites (like xr.corr), (a, b)."""
+    a = comp_a.reshape(len(comp_a), -1)
+    b = comp_b.reshape(len(comp_b), -1)
+    valid = ~(np.isnan(a).any(axis=0) | np.isnan(b).any(axis=0))
+    a = a[:, valid] - a[:, valid].mean(axis=1, keepdims=True)
+    b = b[:, valid] - b[:, valid].mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (a @ b.T) / np.sqrt((a * a).sum(axis=1)[:, None] * (b * b).sum(axis=1)[None, :])
+
+
+def align_regimes(comp_ref, comp_new, fixed=()):
+    """
+    Optimal one-to-one matching of new regimes to reference regimes.
+
+    Maximizes the summed composite correlation with the Hungarian algorithm,
+    so two regimes can never map to the same target. Labels in fixed (e.g. 7,
+    'no regime' of the short files) keep their number. New regimes without a
+    partner get numbers after the reference regimes.
+
+    Returns mapping (mapping[new_label] = reference label) and the full
+    correlation matrix (reference, new).
+    """
+    corr = pattern_correlation(comp_ref, comp_new)
+    free_ref = np.array([i for i in range(len(comp_ref)) if i not in fixed])
+    free_new = np.array([i for i in range(len(comp_new)) if i not in fixed])
+    rows, cols = linear_sum_assignment(-np.nan_to_num(corr[np.ix_(free_ref, free_new)], nan=-1.))
+    mapping = np.arange(len(comp_new))
+    mapping[free_new[cols]] = free_ref[rows]
+    unmatched = np.setdiff1d(free_new, free_new[cols])
+    mapping[unmatched] = len(comp_ref) + np.arange(len(unmatched))
+    return mapping, corr
+
+
+def relabel(wr, mapping):
+    """Label series (DataArray or array) with the labels replaced by mapping."""
+    mapping = np.asarray(mapping)
+    return wr.copy(data=mapping[wr.values]) if hasattr(wr, 'values') else mapping[np.asarray(wr)]
+
+
+
+######################Mini-batch clustering######################
+def centroid_error(centroids, reference):
+    """
+    Distance of matched centroids relative to the mean distance between the
+    reference centroids, per regime.
+    """
+    p = match_centroids(centroids, reference)
+    spacing = np.sqrt(((reference[:, None] - reference[None, :])**2).sum(axis=2))
+    spacing = spacing.sum() / (len(reference) * (len(reference) - 1))
+    return np.sqrt(((centroids[p] - reference)**2).sum(axis=1)) / spacing
+
+
+def minibatch_kmeans(pcs, n_clusters=7, batch_size=4096, init_size=20000, max_epochs=20, tol=1e-3,
+                     n_refine=2, random_state=0):
+    """
+    MiniBatchKMeans streamed over the samples in batches of batch_size.
+
+    pcs is either an array (..., mode), e.g. (number, time, mode) for an
+    ensemble, whose samples are shuffled every epoch, or a function returning
+    a new iterator over (samples, mode) batches for data that does not fit in
+    memory. The centroids are initialized by KMeans (10 starts) on the first
+    init_size samples (shuffled for arrays). Epochs stop when no centroid moves by more than tol times the mean
+    centroid spacing. n_refine streamed full Lloyd passes (exact centroid
+    means accumulated batch by batch) then remove the mini-batch noise.
+
+    Tolerance: centroid_error(model.cluster_centers_, full_kmeans_centroids)
+    stays below 0.01 (1% of the mean centroid spacing) for well separated
+    regimes. For weakly clustered data both methods may end in different
+    local optima, compare with full KMeans on a subsample before relying on it.
+
+    Returns the fitted model and the labels (shape of pcs without the mode
+    dimension, or concatenated over all batches).
+    """
+    rng = np.random.default_rng(random_state)
+    if callable(pcs):
+        batches = pcs
+    else:
+        pcs = np.asarray(pcs)
+        flat = pcs.reshape(-1, pcs.shape[-1])
+        def batches(shuffle=True):
+            order = rng.permutation(len(flat)) if shuffle else np.arange(len(flat))
+            for i in range(0, len(flat), batch_size):
+                yield flat[np.sort(order[i:i + batch_size])]
+
+    init = []
+    for batch in batches():
+        init.append(batch)
+        if sum(len(b) for b in init) >= init_size:
+            break
+    init = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state).fit(np.concatenate(init)[:init_size])
+    model = MiniBatchKMeans(n_clusters=n_clusters, init=init.cluster_centers_, n_init=1,
+                            batch_size=batch_size, random_state=random_state)
+    for epoch in range(max_epochs):
+        old = None if epoch == 0 else model.cluster_centers_.copy()
+        for batch in batches():
+            model.partial_fit(batch)
+        if old is not None and centroid_error(model.cluster_centers_, old).max() < tol:
+            break
+
+    for _ in range(n_refine):
+        sums = np.zeros_like(model.cluster_centers_)
+        counts = np.zeros(n_clusters)
+        for batch in batches():
+            onehot = np.eye(n_clusters)[model.predict(batch)]
+            sums += onehot.T @ batch
+            counts += onehot.sum(axis=0)
+        filled = counts > 0
+        model.cluster_centers_[filled] = sums[filled] / counts[filled, None]
+
+    if callable(pcs):
+        labels = np.concatenate([model.predict(batch) for batch in batches()])
+    else:
+        labels = np.concatenate([model.predict(batch) for batch in batches(shuffle=False)]).reshape(pcs.shape[:-1])
+    return model, labels
+
+
+
+######################Persistence constrained clustering######################
+def min_duration_viterbi(cost, min_duration=4, switch_penalty=0.):
+    """
+    Label sequence with minimal total cost in which every regime episode lasts
+    at least min_duration time steps.
+
+    cost (time, regime) is e.g. the squared distance to the centroids. Every
+    regime change adds switch_penalty. Dynamic programming over the states
+    (regime, days in episode up to min_duration), vectorized over all states.
+    """
+    n, k = cost.shape
+    L = max(int(min_duration), 1)
+    regimes = np.arange(k)
+    D = np.full((k, L), np.inf)
+    D[:, 0] = cost[0]
+    from_regime = np.zeros((n, k), dtype=int)
+    from_stay = np.zeros((n, k), dtype=bool)
+    for t in range(1, n):
+        last = D[:, L - 1]
+        # Best episode end of another regime for every regime
+        first, second = np.argsort(last)[:2] if k > 1 else (0, 0)
+        prev = np.where(regimes == first, second, first)
+        switch = last[prev] + switch_penalty
+        new = np.empty_like(D)
+        if L == 1:
+            from_stay[t] = last <= switch
+            new[:, 0] = np.where(from_stay[t], last, switch)
+        else:
+            from_stay[t] = last <= D[:, L - 2]
+            new[:, 0] = switch
+            new[:, 1:L - 1] = D[:, :L - 2]
+            new[:, L - 1] = np.minimum(D[:, L - 2], last)
+        from_regime[t] = prev
+        D = new + cost[t][:, None]
+
+    # Backtrack from the best complete episode at the end
+    labels = np.empty(n, dtype=int)
+    r, d = int(np.argmin(D[:, L - 1])), L - 1
+    for t in range(n - 1, -1, -1):
+        labels[t] = r
+        if t == 0:
+            break
+        if d == L - 1 and from_stay[t, r]:
+            continue
+        if d == 0:
+            r, d = from_regime[t, r], L - 1
+        else:
+            d -= 1
+    return labels
+
+
+def persistent_kmeans(pcs, n_clusters=7, min_duration=4, switch_penalty=0., max_iter=20, random_state=0):
+    """
+    KMeans with a minimum regime duration enforced in the assignment step.
+
+    Starts from KMeans centroids and alternates the constrained assignment
+    (min_duration_viterbi on the squared centroid distances) with the centroid
+    update until the labels do not change. Gives the final label series
+    directly, no short episodes have to be removed afterwards.
+
+    Returns the model (centroids updated) and the labels.
+    """
+    pcs = np.asarray(pcs)
+    model = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state).fit(pcs)
+    labels = model.labels_
+    for _ in range(max_iter):
+        cost = ((pcs[:, None, :] - model.cluster_centers_[None, :, :])**2).sum(axis=2)
+        new = min_duration_viterbi(cost, min_duration, switch_penalty)
+        onehot = np.eye(n_clusters)[new]
+        counts = onehot.sum(axis=0)
+        filled = counts > 0
+        model.cluster_centers_[filled] = (onehot.T @ pcs)[filled] / counts[filled, None]
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    model.labels_ = labels
+    return model, labels
+
+
+
+######################Hidden Markov regime model######################
+class GaussianHMM:
+    """
+    Hidden Markov model with Gaussian emissions on the leading PCs.
+
+    Fitted by EM (Baum-Welch) starting from KMeans. Forward-backward runs in
+    log space (max-shifted), vectorized over the states, and the transition
+    statistics of all days are summed in one step. Regimes are numbered by
+    decreasing frequency. After fit():
+        labels_           Viterbi regime sequence
+        posteriors_       (time, regime) state probabilities
+        transmat_         (from, to) transition probabilities
+        cluster_centers_  emission means (for RegimeModel)
+    """
+
+    def __init__(self, n_clusters=7, max_iter=100, tol=1e-4, reg_covar=1e-6, random_state=0):
+        self.n_clusters = n_clusters
+        self.max_iter = max_iter
+        self.tol = tol
+        self.reg_covar = reg_covar
+        self.random_state = random_state
+
+    def _log_emission(self, X):
+        # log N(x | mean_k, cov_k) for all days and states
+        logb = np.empty((len(X), self.n_clusters))
+        for k in range(self.n_clusters):
+            chol = np.linalg.cholesky(self.covars_[k])
+            z = np.linalg.solve(chol, (X - self.means_[k]).T)
+            logb[:, k] = -0.5 * (z * z).sum(axis=0) - np.log(np.diag(chol)).sum() \
+                - 0.5 * X.shape[1] * np.log(2 * np.pi)
+        return logb
+
+    def _forward_backward(self, logb):
+        n, k = logb.shape
+        A = self.transmat_
+        log_alpha = np.empty((n, k))
+        log_beta = np.zeros((n, k))
+        log_alpha[0] = np.log(self.startprob_) + logb[0]
+        for t in range(1, n):
+            m = log_alpha[t - 1].max()
+            log_alpha[t] = logb[t] + m + np.log(np.exp(log_alpha[t - 1] - m) @ A)
+        for t in range(n - 2, -1, -1):
+            x = logb[t + 1] + log_beta[t + 1]
+            m = x.max()
+            log_beta[t] = m + np.log(A @ np.exp(x - m))
+        m = log_alpha[-1].max()
+        loglik = m + np.log(np.exp(log_alpha[-1] - m).sum())
+        return log_alpha, log_beta, loglik
+
+    def _init(self, X):
+        model = KMeans(n_clusters=self.n_clusters, n_init=10, random_state=self.random_state).fit(X)
+        labels = model.labels_
+        self.means_ = model.cluster_centers_
+        self.covars_ = np.stack([np.cov(X[labels == k].T) + self.reg_covar * np.eye(X.shape[1])
+                                 for k in range(self.n_clusters)])
+        counts = np.ones((self.n_clusters, self.n_clusters))
+        np.add.at(counts, (labels[:-1], labels[1:]), 1)
+        self.transmat_ = counts / counts.sum(axis=1, keepdims=True)
+        self.startprob_ = np.full(self.n_clusters, 1. / self.n_clusters)
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=float)
+        self._init(X)
+        self.loglik_ = []
+        for _ in range(self.max_iter):
+            # E-step
+            logb = self._log_emission(X)
+            log_alpha, log_beta, loglik = self._forward_backward(logb)
+            gamma = np.exp(log_alpha + log_beta - loglik)
+            log_xi = (log_alpha[:-1, :, None] + np.log(self.transmat_)[None]
+                      + (logb[1:] + log_beta[1:])[:, None, :] - loglik)
+            xi = np.exp(log_xi).sum(axis=0)
+            # M-step
+            weight = gamma.sum(axis=0)
+            self.startprob_ = gamma[0].clip(1e-12) / gamma[0].clip(1e-12).sum()
+            self.transmat_ = xi / xi.sum(axis=1, keepdims=True)
+            self.means_ = (gamma.T @ X) / weight[:, None]
+            diff = X[:, None, :] - self.means_[None]
+            self.covars_ = np.einsum('nk,nki,nkj->kij', gamma, diff, diff) / weight[:, None, None] \
+                + self.reg_covar * np.eye(X.shape[1])
+            self.loglik_.append(loglik)
+            if len(self.loglik_) > 1 and abs(self.loglik_[-1] - self.loglik_[-2]) < self.tol * abs(self.loglik_[-2]):
+                break
+
+        # Number regimes by decreasing frequency
+        order = np.argsort(gamma.sum(axis=0))[::-1]
+        self.means_, self.covars_ = self.means_[order], self.covars_[order]
+        self.transmat_ = self.transmat_[order][:, order]
+        self.startprob_ = self.startprob_[order]
+        self.cluster_centers_ = self.means_
+        self.labels_ = self.predict(X)
+        self.posteriors_ = self.predict_proba(X)
+        return self
+
+    def predict_proba(self, X):
+        logb = self._log_emission(np.asarray(X, dtype=float))
+        log_alpha, log_beta, loglik = self._forward_backward(logb)
+        return np.exp(log_alpha + log_beta - loglik)
+
+    def predict(self, X):
+        """Most likely regime sequence (Viterbi)."""
+        logb = self._log_emission(np.asarray(X, dtype=float))
+        n, k = logb.shape
+        logA = np.log(self.transmat_)
+        delta = np.log(self.startprob_) + logb[0]
+        back = np.empty((n, k), dtype=int)
+        for t in range(1, n):
+            scores = delta[:, None] + logA
+            back[t] = scores.argmax(axis=0)
+            delta = scores[back[t], np.arange(k)] + logb[t]
+        labels = np.empty(n, dtype=int)
+        labels[-1] = delta.argmax()
+        for t in range(n - 1, 0, -1):
+            labels[t - 1] = back[t, labels[t]]
+        return labels
+
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:31:16 2026
+
+@author: Dirk
+
+
+Statistics of the daily weather regime time series (wr_time files).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+
+
+######################Episodes######################
+def run_lengths(labels):
+    """
+    Run-length encoding of a label series in one vectorized pass.
+
+    Returns the start index, length and label of every episode (run of
+    consecutive days with the same regime).
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), labels[:0]
+    starts = np.r_[0, np.flatnonzero(labels[1:] != labels[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(labels)])
+    return starts, lengths, labels[starts]
+
+
+def remove_short(labels, short=3, fill=7):
+    """
+    Labels with all episodes of at most short days set to fill ('no regime').
+
+    Returns the new labels and the number of removed episodes per length
+    (index 0..short).
+    """
+    labels = np.asarray(labels)
+    starts, lengths, _ = run_lengths(labels)
+    mask = np.repeat(lengths <= short, lengths)
+    counts = np.bincount(lengths[lengths <= short], minlength=short + 1)
+    return np.where(mask, fill, labels), counts
+
+
+def episodes(wr):
+    """
+    Episode (life cycle) table of a wr_time DataArray.
+
+    One row per episode with regime, start and end date, length in days and
+    the preceding and following regime (-1 at the ends of the series).
+    """
+    starts, lengths, labels = run_lengths(wr.values)
+    time = wr.time.values
+    return pd.DataFrame({'wr': labels,
+                         'start': time[starts],
+                         'end': time[starts + lengths - 1],
+                         'length': lengths,
+                         'preceding': np.r_[-1, labels[:-1]],
+                         'following': np.r_[labels[1:], -1]})
+
+
+def derived_file(f_wr, kind):
+    # wr_time-c7_std_... .nc -> <kind>-c7_std_... .nc
+    f_wr = Path(f_wr)
+    return f_wr.with_name(f_wr.name.replace('wr_time', kind, 1))
+
+
+def episode_file(f_wr):
+    return derived_file(f_wr, 'wr_episodes')
+
+
+def _up_to_date(f_cache, f_wr):
+    return f_cache.exists() and f_cache.stat().st_mtime >= Path(f_wr).stat().st_mtime
+
+
+def save_episodes(table, path):
+    """Store an episode table as a compact netCDF file with one column per variable."""
+    ds = xr.Dataset({'wr': ('episode', table.wr.values.astype('int8')),
+                     'start': ('episode', table.start.values),
+                     'end': ('episode', table.end.values),
+                     'length': ('episode', table.length.values.astype('int32')),
+                     'preceding': ('episode', table.preceding.values.astype('int8')),
+                     'following': ('episode', table.following.values.astype('int8'))})
+    ds.to_netcdf(path)
+
+
+def load_episodes(f_wr, f_episodes=None):
+    """
+    Episode table of the wr_time file f_wr.
+
+    Read from the episode file next to f_wr if it is up to date, otherwise
+    derived from the labels and written to that file.
+    """
+    f_wr = Path(f_wr)
+    f_episodes = episode_file(f_wr) if f_episodes is None else Path(f_episodes)
+    if _up_to_date(f_episodes, f_wr):
+        with xr.open_dataset(f_episodes) as ds:
+            table = ds.to_dataframe().reset_index(drop=True)
+        return table.astype({'wr': int, 'length': int, 'preceding': int, 'following': int})
+    with xr.open_dataset(f_wr) as ds:
+        table = episodes(ds.wr)
+    save_episodes(table, f_episodes)
+    return table
+
+
+
+######################Frequencies######################
+seasons = ['DJF', 'MAM', 'JJA', 'SON']
+
+
+def time_codes(time):
+    """Integer season (0..3, DJF first), month (0..11) and year (0..) codes of a time axis."""
+    time = pd.DatetimeIndex(time)
+    month = time.month.values - 1
+    season = (month + 1) // 3 % 4
+    year = time.year.values - time.year.min()
+    return season, month, year
+
+
+def crosstab(labels, codes, n_regimes, n_codes):
+    """Regime x code count matrix with a single bincount."""
+    return np.bincount(labels * n_codes + codes, minlength=n_regimes * n_codes).reshape(n_regimes, n_codes)
+
+
+def frequency_counts(wr, n_regimes=None):
+    """
+    Number of days of every regime per season, month and year of a wr_time
+    DataArray (season_count, month_count, year_count).
+    """
+    labels = np.asarray(wr.values, dtype=int)
+    n_regimes = labels.max() + 1 if n_regimes is None else n_regimes
+    season, month, year = time_codes(wr.time.values)
+    years = pd.DatetimeIndex(wr.time.values).year
+    return xr.Dataset({'season_count': (('wr', 'season'), crosstab(labels, season, n_regimes, 4)),
+                       'month_count': (('wr', 'month'), crosstab(labels, month, n_regimes, 12)),
+                       'year_count': (('wr', 'year'), crosstab(labels, year, n_regimes, year.max() + 1))},
+                      coords={'wr': np.arange(n_regimes), 'season': seasons, 'month': np.arange(1, 13),
+                              'year': np.arange(years.min(), years.max() + 1)})
+
+
+def load_frequencies(f_wr, f_frequency=None):
+    """
+    Frequency counts of the wr_time file f_wr, cached in the wr_frequency
+    file next to it like load_episodes.
+    """
+    f_frequency = derived_file(f_wr, 'wr_frequency') if f_frequency is None else Path(f_frequency)
+    if _up_to_date(f_frequency, f_wr):
+        with xr.open_dataset(f_frequency) as ds:
+            return ds.load()
+    with xr.open_dataset(f_wr) as ds:
+        counts = frequency_counts(ds.wr)
+    counts.to_netcdf(f_frequency)
+    return counts
+
+
+def season_frequency(counts):
+    """Relative frequency table of the regimes (WR0, WR1, ...) per season and in total ('tot')."""
+    count = counts.season_count.values
+    frequency = np.column_stack([count / count.sum(axis=0), count.sum(axis=1) / count.sum()])
+    return pd.DataFrame(frequency.T, index=seasons + ['tot'], columns=['WR' + str(i) for i in counts.wr.values])
+
+
+
+######################Transitions######################
+def transition_counts(wr, lag=1, exclude_self=True, episode_level=False, n_regimes=None):
+    """
+    Regime transition counts per season (season, wr_from, wr_to) of a
+    wr_time DataArray, one bincount over the (season, from, to) codes.
+
+    Day-level transitions pair every day with the day lag days later, both
+    in the same season. With episode_level=True every episode is paired with
+    the following one (lag episodes later) and the season is the one of the
+    transition day. Self-transitions are left out with exclude_self.
+    """
+    labels = np.asarray(wr.values, dtype=int)
+    n_regimes = labels.max() + 1 if n_regimes is None else n_regimes
+    season, _, _ = time_codes(wr.time.values)
+    day = wr.time.values.astype('datetime64[D]').astype(int)
+    if episode_level:
+        starts, lengths, labels = run_lengths(labels)
+        season, day = season[starts], day[starts]
+        # the transition to episode i+lag happens on its first day
+        valid = np.ones(len(labels) - lag, dtype=bool)
+        season = season[lag:]
+    else:
+        valid = (day[lag:] - day[:-lag] == lag) & (season[lag:] == season[:-lag])
+        season = season[:-lag]
+    start, end = labels[:-lag], labels[lag:]
+    if exclude_self:
+        valid &= start != end
+    code = (season * n_regimes + start) * n_regimes + end
+    counts = np.bincount(code[valid], minlength=4 * n_regimes**2).reshape(4, n_regimes, n_regimes)
+    return xr.DataArray(counts, dims=('season', 'wr_from', 'wr_to'),
+                        coords={'season': seasons, 'wr_from': np.arange(n_regimes), 'wr_to': np.arange(n_regimes)},
+                        name='transitions')
+
+
+def transition_matrix(counts, norm='total'):
+    """
+    Normalized transition matrices: 'total' divides by all transitions of the
+    season (as in the S*.py variability metrics), 'row' gives the transition
+    probabilities from every regime (Markov matrix).
+    """
+    if norm == 'total':
+        total = counts.sum(('wr_from', 'wr_to'))
+    elif norm == 'row':
+        total = counts.sum('wr_to')
+    else:
+        raise ValueError("norm must be 'total' or 'row'")
+    return (counts / total.where(total > 0)).fillna(0.).rename('transition_frequency')
+
+
+
+######################Trends######################
+def year_counts(wr, season=None, n_regimes=None):
+    """
+    Regime x year day counts of a wr_time DataArray with one bincount, only
+    the days of season ('DJF', ...) if given. Years are calendar years.
+    """
+    labels = np.asarray(wr.values, dtype=int)
+    n_regimes = labels.max() + 1 if n_regimes is None else n_regimes
+    codes, _, year = time_codes(wr.time.values)
+    years = pd.DatetimeIndex(wr.time.values).year
+    keep = slice(None) if season is None else codes == seasons.index(season)
+    counts = crosstab(labels[keep], year[keep], n_regimes, year.max() + 1)
+    return xr.DataArray(counts, dims=('wr', 'year'),
+                        coords={'wr': np.arange(n_regimes), 'year': np.arange(years.min(), years.max() + 1)},
+                        name='count')
+
+
+def rolling_frequency(counts, window=10):
+    """
+    Regime frequencies in running windows of window years from cumulative
+    sums of the (wr, year) counts, labelled with the central year.
+    """
+    cum = np.concatenate([np.zeros((len(counts.wr), 1)), np.cumsum(counts.values, axis=1)], axis=1)
+    days = cum[:, window:] - cum[:, :-window]
+    years = counts.year.values
+    return xr.DataArray(days / days.sum(axis=0), dims=('wr', 'year'),
+                        coords={'wr': counts.wr.values, 'year': years[:len(years) - window + 1] + (window - 1) / 2},
+                        name='frequency')
+
+
+def _slopes(frequency, x):
+    # Least-squares slope of every row of frequency (..., year) against x
+    xc = x - x.mean()
+    return (frequency - frequency.mean(axis=-1, keepdims=True)) @ xc / (xc @ xc)
+
+
+def _permutation_batch(frequency, x, order):
+    # Slopes of the (wr, year) frequencies for every permuted year order (perm, year)
+    return _slopes(frequency[:, order].transpose(1, 0, 2), x)
+
+
+def block_permutations(n_years, n_permutations, block=5, random_state=0):
+    """Year orders (n_permutations, n_years) from shuffled blocks of block consecutive years."""
+    rng = np.random.default_rng(random_state)
+    blocks = np.array_split(np.arange(n_years), int(np.ceil(n_years / block)))
+    starts = np.array([b[0] for b in blocks])
+    sizes = np.array([len(b) for b in blocks])
+    order = np.argsort(rng.random((n_permutations, len(blocks))), axis=1)
+    return np.stack([np.concatenate([np.arange(starts[i], starts[i] + sizes[i]) for i in o]) for o in order])
+
+
+def frequency_trends(counts, n_permutations=1000, block=5, n_jobs=4, random_state=0):
+    """
+    Linear trend of the yearly frequency of every regime (per decade) with a
+    two-sided block-permutation p-value: whole blocks of block years are
+    shuffled to keep the year-to-year persistence, and the slopes of all
+    permutations are computed in batches on n_jobs threads.
+    """
+    frequency = (counts / counts.sum('wr')).values
+    x = counts.year.values.astype(float)
+    slope = _slopes(frequency, x)
+    orders = block_permutations(len(x), n_permutations, block, random_state)
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        null = np.concatenate(list(pool.map(lambda o: _permutation_batch(frequency, x, o),
+                                            np.array_split(orders, n_jobs))))
+    p_value = ((np.abs(null) >= np.abs(slope)).sum(axis=0) + 1) / (n_permutations + 1)
+    return pd.DataFrame({'frequency': frequency.mean(axis=1),
+                         'trend_per_decade': slope * 10,
+                         'p_value': p_value},
+                        index=pd.Index(counts.wr.values, name='wr'))
+
+
+
+######################Lagged composites######################
+def _accumulate(sums, code, values):
+    # sums[code[i]] += values[i] for all i, grouped with one reduceat
+    order = np.argsort(code, kind='stable')
+    code = code[order]
+    first = np.r_[0, np.flatnonzero(np.diff(code)) + 1]
+    sums[code[first]] += np.add.reduceat(values[order], first, axis=0)
+
+
+def lagged_composites(field, onset, regime, lags=range(-5, 11), n_regimes=None, chunk_size=None):
+    """
+    Mean of field (time, ...) lag days after the onsets (time indices into
+    field) of every regime, shape (regime, lag, ...), and the number of
+    onsets per regime and lag.
+
+    The days of all onsets and lags are gathered with one fancy index per
+    time chunk, so a lazily opened cube is read chunk by chunk (chunk_size
+    days, whole record if None). Days outside the record are left out.
+    """
+    onset, regime, lags = np.asarray(onset), np.asarray(regime), np.asarray(lags)
+    n_regimes = regime.max() + 1 if n_regimes is None else n_regimes
+    n = field.shape[0]
+    day = (onset[:, None] + lags).ravel()
+    code = (regime[:, None] * len(lags) + np.arange(len(lags))).ravel()
+    valid = (day >= 0) & (day < n)
+    day, code = day[valid], code[valid]
+
+    counts = np.bincount(code, minlength=n_regimes * len(lags))
+    sums = np.zeros((n_regimes * len(lags),) + tuple(field.shape[1:]))
+    chunk_size = n if chunk_size is None else chunk_size
+    for start in range(0, n, chunk_size):
+        inside = (day >= start) & (day < start + chunk_size)
+        if inside.any():
+            block = np.asarray(field[start:start + chunk_size])
+            _accumulate(sums, code[inside], block[day[inside] - start])
+    with np.errstate(invalid='ignore'):
+        mean = sums / counts.reshape((-1,) + (1,) * (sums.ndim - 1))
+    mean = mean.reshape((n_regimes, len(lags)) + tuple(field.shape[1:]))
+    counts = counts.reshape(n_regimes, len(lags))
+
+    if isinstance(field, xr.DataArray):
+        dims = ('wr', 'lag') + field.dims[1:]
+        coords = {dim: field[dim].values for dim in field.dims[1:] if dim in field.coords}
+        mean = xr.DataArray(mean, dims=dims, coords=dict(coords, wr=np.arange(n_regimes), lag=lags),
+                            name=field.name)
+        counts = xr.DataArray(counts, dims=('wr', 'lag'), coords={'wr': np.arange(n_regimes), 'lag': lags},
+                              name='onsets')
+    return mean, counts
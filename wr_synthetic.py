@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:34:43 2026
+
+@author: Dirk
+
+
+Synthetic weather regime sequences from a seasonal Markov or semi-Markov
+model fitted to a wr_time series, and resampling of historical days
+(capacity factors, load, ...) along the synthetic sequences.
+"""
+
+import numpy as np
+import pandas as pd
+
+from wr_stats import run_lengths, time_codes, transition_counts, transition_matrix
+
+
+
+######################Helpers######################
+def _draw(cdf, u):
+    # Inverse CDF per row: cdf (n, k), u (n,) -> index 0..k-1
+    return np.minimum((u[:, None] > cdf).sum(axis=1), cdf.shape[1] - 1)
+
+
+def _pools(codes, n_codes):
+    # Indices grouped by code: order, start and size of every group
+    order = np.argsort(codes, kind='stable')
+    size = np.bincount(codes, minlength=n_codes)
+    return order, np.cumsum(size) - size, size
+
+
+
+######################Generator######################
+class RegimeGenerator:
+    """
+    Seasonal Markov or semi-Markov chain of the daily weather regimes.
+
+    mode='markov' uses the day-to-day transition probabilities (including
+    persistence) of every season. mode='semi-markov' uses the
+    episode-to-episode transition probabilities of every season and draws
+    the length of every new episode from the historical episode lengths of
+    the same regime and season. After fit():
+        transmat_   (season, from, to) transition probabilities
+        startprob_  regime frequencies of the first day of the year (DJF)
+    """
+
+    def __init__(self, mode='semi-markov', random_state=0):
+        if mode not in ('markov', 'semi-markov'):
+            raise ValueError("mode must be 'markov' or 'semi-markov'")
+        self.mode = mode
+        self.random_state = random_state
+
+    def fit(self, wr):
+        """Fit to a wr_time DataArray (daily labels with time coordinate)."""
+        labels = np.asarray(wr.values, dtype=int)
+        self.n_regimes = k = labels.max() + 1
+        counts = transition_counts(wr, exclude_self=self.mode == 'semi-markov',
+                                   episode_level=self.mode == 'semi-markov', n_regimes=k)
+        # regimes never left in a season fall back to the annual transitions
+        annual = counts.sum('season').values
+        row = annual.sum(axis=1, keepdims=True)
+        annual = np.where(row > 0, annual / np.maximum(row, 1), 1. / k)
+        transmat = transition_matrix(counts, norm='row').values
+        empty = transmat.sum(axis=2) == 0
+        transmat[empty] = np.broadcast_to(annual, transmat.shape)[empty]
+        self.transmat_ = transmat
+
+        season, _, _ = time_codes(wr.time.values)
+        self.startprob_ = np.bincount(labels[season == 0], minlength=k) / (season == 0).sum()
+
+        if self.mode == 'semi-markov':
+            starts, lengths, episode = run_lengths(labels)
+            code = season[starts] * k + episode
+            order, start, size = _pools(code, 4 * k)
+            # regimes without an episode in a season use all their episodes
+            order_all, start_all, size_all = _pools(episode, k)
+            missing = size == 0
+            self._durations = np.r_[lengths[order], lengths[order_all]]
+            self._duration_start = np.where(missing, len(order) + np.tile(start_all, 4), start)
+            self._duration_size = np.where(missing, np.tile(size_all, 4), size)
+        return self
+
+    def _durations_for(self, season, regime, u):
+        code = season * self.n_regimes + regime
+        return self._durations[self._duration_start[code] + (u * self._duration_size[code]).astype(int)]
+
+    def simulate(self, n_years, n_realizations=1):
+        """
+        Synthetic regime sequences (realization, day) of n_years 365-day
+        years, all realizations stepped together day by day.
+        """
+        rng = np.random.default_rng(self.random_state)
+        season = self.calendar(n_years)
+        cdf = np.cumsum(self.transmat_, axis=2)
+        labels = np.empty((n_realizations, len(season)), dtype=np.int8)
+        current = _draw(np.broadcast_to(np.cumsum(self.startprob_), (n_realizations, self.n_regimes)),
+                        rng.random(n_realizations))
+        if self.mode == 'semi-markov':
+            remaining = self._durations_for(season[0], current, rng.random(n_realizations))
+        for t, s in enumerate(season):
+            if t > 0:
+                if self.mode == 'markov':
+                    current = _draw(cdf[s, current], rng.random(n_realizations))
+                else:
+                    # a new episode starts where the last one has ended
+                    remaining -= 1
+                    new = np.flatnonzero(remaining == 0)
+                    current[new] = _draw(cdf[s, current[new]], rng.random(len(new)))
+                    remaining[new] = self._durations_for(s, current[new], rng.random(len(new)))
+            labels[:, t] = current
+        return labels
+
+    @staticmethod
+    def calendar(n_years):
+        """Season codes (0..3, DJF first) of the days of n_years 365-day years."""
+        days = pd.date_range('2001-01-01', '2001-12-31')
+        return np.tile(time_codes(days)[0], n_years)
+
+
+def resample_days(synthetic, season, wr, random_state=0):
+    """
+    Historical day for every synthetic day: a random day of wr (wr_time
+    DataArray) with the same regime and season. Returns indices into wr.time
+    with the shape of synthetic, to attach capacity factors, load, ... with
+    values[index]. Regimes without historical days in a season are drawn from
+    their days of all seasons.
+    """
+    rng = np.random.default_rng(random_state)
+    labels = np.asarray(wr.values, dtype=int)
+    k = max(labels.max(), synthetic.max()) + 1
+    hist_season, _, _ = time_codes(wr.time.values)
+    order, start, size = _pools(hist_season * k + labels, 4 * k)
+    # regimes without historical days in a season use their days of all seasons
+    order_all, start_all, size_all = _pools(labels, k)
+    missing = size == 0
+    order = np.r_[order, order_all]
+    start = np.where(missing, len(labels) + np.tile(start_all, 4), start)
+    size = np.where(missing, np.tile(size_all, 4), size)
+    code = np.broadcast_to(season, synthetic.shape) * k + synthetic
+    return order[start[code] + (rng.random(code.shape) * size[code]).astype(int)]